@@ -1,14 +1,19 @@
 from rdflib import Graph, Namespace, Literal, URIRef, BNode,ConjunctiveGraph, Dataset
 from rdflib.namespace import XSD, RDF
-from collections import defaultdict
 from datetime import date, timedelta,timezone,datetime
 import os
 import time
 from pathlib import Path
+from ldes_stream import stream_observations, open_source
+from ldes_buckets import bucket_datetimes
+from ldes_log import RunLog
 
 # --- Config ---
 input_path = "./sources/Mol_Sluis_Dessel_data_prettified.ttl"
 base_path = "./LDES"
+stream_input = False #stream observations straight from the file instead of building a Graph (for multi-GB sources)
+log_level = "debug" #logs.txt detail: "debug" (every folder visited), "info" (tree files written), "warning" or "quiet" (no log file)
+log_format = "text" #logs.txt format: "text" or "jsonl" (one JSON object per message)
 
 # --- Namespaces ---
 SOSA = Namespace("http://www.w3.org/ns/sosa/")
@@ -21,6 +26,7 @@ LDES = Namespace("https://w3id.org/ldes#")
 TREE = Namespace("https://w3id.org/tree#")
 eventstream_uri = URIRef("https://shehabeldeenayman.github.io/Mol_sluis_Dessel_Usecase/")
 #view_uri = URIRef("https://shehabeldeenayman.github.io/Mol_sluis_Dessel_Usecase/data/data.ttl")
+run_log = RunLog() #logs.txt of the current run, see ldes_log
 
 
 #RDF2LDES##############################################################################################
@@ -28,7 +34,9 @@ eventstream_uri = URIRef("https://shehabeldeenayman.github.io/Mol_sluis_Dessel_U
 def load_graph(input_path):
     """Load the RDF graph from a Turtle file."""
     g = Graph()
-    g.parse(input_path, format="turtle", publicID="https://example.org/")
+    # compressed (.gz/.bz2/.xz/.zst) sources are decompressed while rdflib reads them
+    with open_source(input_path, binary=True) as source:
+        g.parse(source, format="turtle", publicID="https://example.org/")
     return g
 
 
@@ -78,14 +86,13 @@ def extract_observations(g: Graph):
 
 def divide_data(observations):
     """Group observations by (year, month, day) and write one file per day."""
-    grouped = defaultdict(list)
+    observations = list(observations)
 
-    # Group all observations by date
-    for obs, id_, result_value, property_, time_ in observations:
-        key = (time_.year, time_.month, time_.day)
-        grouped[key].append((obs, id_, result_value, property_, time_))
+    # Group all observations by date in one sort; each day comes out time-sorted
+    buckets = bucket_datetimes([time_ for _, _, _, _, time_ in observations], "day")
 
-    for (year, month, day), daily_obs in grouped.items():
+    for (year, month, day), rows in buckets.rows():
+        daily_obs = [observations[i] for i in rows.tolist()]
         file_path = os.path.join(base_path, f"{year}/{month:02d}/{day:02d}/readings.ttl")
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
@@ -120,19 +127,19 @@ def create_ldes_files():
         root = Path(root).as_posix()
         
         #print("Current folder:", root)
-        write_log(f"Current folder: {root} \n")
-        write_log(f"Current folder length: {len(Path(root).parts)} \n")
         path = Path(root)
+        run_log.debug("Current folder: %s \n", root)
+        run_log.debug("Current folder length: %d \n", len(path.parts))
         #print("Last Folder", path.parts[-1]) #File name maybe
-        write_log(f"Last part of directory {path.parts[-1]} \n")
+        run_log.debug("Last part of directory %s \n", path.parts[-1])
         #print("Subfolders:", dirs)
         #print("Subfolders:\n " + "\n ".join(dirs))
         # with open(os.path.join(root,f"{path.parts[-1]}.ttl"),'w') as file:
         #     pass
         temp_graph = create_base_graph()
         direct_subfolders = [Path(root) / d for d in dirs]
-        for folder in direct_subfolders:
-            write_log(f"  Subfolder: {folder.as_posix()}\n")
+        for folder in direct_subfolders if run_log.enabled("debug") else ():
+            run_log.debug("  Subfolder: %s\n", folder.as_posix())
             #print(len(Path(folder).parts),"\n")
 
         # for sub in direct_subfolders:
@@ -148,7 +155,7 @@ def create_ldes_files():
             #print(" Subfolder:", d)
             temp_graph.add((eventstream_uri, TREE.view, URIRef(f"{eventstream_uri}{root}/{path.parts[-1]}.ttl")))
             
-            write_log(f"Subfolder: {d} \n")
+            run_log.debug("Subfolder: %s \n", d)
             bn_ge = BNode()
             bn_lt = BNode()
             temp_graph.add((bn_ge, RDF.type, TREE.GreaterThanOrEqualToRelation))
@@ -203,13 +210,13 @@ def create_ldes_files():
         if len(Path(os.path.join(root, f"{path.parts[-1]}.ttl")).parts) <= 4:
             with open(os.path.join(root,f"{path.parts[-1]}.ttl"),'a') as file: # we should move the with open with file write to after the for loop. the for loop will only creat the greater than less than relations. It will add them to the base graph initialized before the loop, then it will be added to the graph and written after the graph.
                     #print(f" Writing to file: {os.path.join(root,f'{path.parts[-1]}.ttl')}")
-                    write_log(f"path parts: {len(Path(os.path.join(root, f"{path.parts[-1]}.ttl")).parts)} \n")
-                    write_log(f" Writing to file: {Path(os.path.join(root,f'{path.parts[-1]}.ttl')).as_posix()} \n")
+                    run_log.debug("path parts: %d \n", len(Path(os.path.join(root, f"{path.parts[-1]}.ttl")).parts))
+                    run_log.info(" Writing to file: %s/%s.ttl \n", root, path.parts[-1])
                     file.write(temp_graph.serialize(format="trig"))
 
         #print("Files:", files)
-        write_log("-" * 40)
-        write_log("\n")
+        run_log.debug("-" * 40)
+        run_log.debug("\n")
         #print("-" * 40)
 
 def create_base_graph():
@@ -240,28 +247,26 @@ def create_base_graph():
     
 
 
-def write_log(msg):
-    with open("logs.txt",'a') as file:
-        file.write(msg)
-def delete_log():
-    if(Path("logs.txt").exists()):
-        os.remove("logs.txt")
 
 #RDF2LDES##############################################################################################
 
 def main():
 ######################################################################
     start_time = time.perf_counter()
-    g = load_graph(input_path)
-    observations = extract_observations(g)
+    if stream_input:
+        observations = stream_observations(input_path)
+    else:
+        g = load_graph(input_path)
+        observations = extract_observations(g)
     divide_data(observations)
     end_time = time.perf_counter()
     print(f"Processing completed in {end_time - start_time:.2f} seconds.")
 ######################################################################
     start_time = time.perf_counter()
-    delete_log()
+    run_log.start(log_level, log_format)
     delete_ldes_files()
     create_ldes_files()
+    run_log.close()
     end_time = time.perf_counter()
     print(f"Processing completed in {end_time - start_time:.2f} seconds.")
 ######################################################################
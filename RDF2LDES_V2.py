@@ -1,20 +1,48 @@
 from rdflib import Graph,URIRef,Namespace,BNode,Literal,Dataset
 from rdflib.namespace import XSD,RDF
 from rdflib.term import BNode
-import pandas as pd
-import argparse
-from collections import defaultdict
 from datetime import datetime, timezone,timedelta
-import json
 import os
-import calendar
 import time
 from pathlib import Path
-from dateutil.relativedelta import relativedelta
+from ldes_stream import stream_observations, open_source
+from ldes_table import ObservationTable
+from ldes_buckets import partition_table
+from ldes_writer import write_observation_table
+from ldes_inputs import expand_inputs
+from ldes_parallel import write_observation_buckets, read_tables, iter_tables
+from ldes_spill import collect_tables, chunk_rows, spill_level
+from ldes_memory import MemoryBudget, parse_size
+from ldes_metrics import RunMetrics, file_size
+from ldes_log import RunLog
+from ldes_tree import BucketIndex, write_tree_nodes, page_bounds, page_dir, remove_stale_pages, calendar_names
+from ldes_state import IncrementalState, STATE_FILE, digest_table_rows, CheckpointJournal, JOURNAL_FILE, append_fragment
+from ldes_cache import SnapshotCache
 
 # --- Config ---
-input_path = "./sources/Mol_Sluis_Dessel_data_prettified.ttl"
+input_path = "./sources/Mol_Sluis_Dessel_data_prettified.ttl" #a file, a directory, a glob such as "./sources/*.ttl.gz" or a list of those
 base_path = "./LDES"
+stream_input = False #stream observations straight from the file instead of building a Graph (for multi-GB sources)
+ingest_workers = None #processes parsing the source files when input_path names several (None: one per CPU)
+out_of_core = False #spill extracted rows to run files per month and write one month at a time (inputs larger than RAM, best with stream_input)
+spill_budget = 512 * 2**20 #out_of_core only: bytes of extracted rows held in memory before they are spilled
+spill_dir = None #out_of_core only: directory for the run files (None: the system temp directory)
+max_memory = None #memory budget in bytes (or --max-memory 8G): rows are spilled like out_of_core and big days skip the rdflib Dataset before it is used up
+snapshot_cache = False #keep the extracted observations in a memory-mapped snapshot next to the source; an unchanged source is not parsed again
+fast_writer = False #format fragments from templates instead of building and serializing a Dataset per day
+output_format = "trig" #fast writer only: "trig" or "nquads"
+workers = 1 #more than 1 writes day fragments in a process pool (largest days first, always with the fast writer)
+tree_from_index = False #build the tree nodes from the buckets divide_data wrote instead of walking the output directory
+incremental = False #only rewrite day fragments whose content changed and the tree nodes above them (state kept in base_path)
+append_only = False #only ingest observations newer than the sosa:resultTime watermark and append them; resumes after a crash
+max_members = None #split days with more observations into time-ordered pages (needs the index based tree)
+levels = ("year", "month", "day") #fragment levels from the root down, any prefix of year/month/day/hour; e.g. ("year", "month") for one file per month
+target_members = None #(low, high): pick the depth per subtree, a bucket is split into the next level only when it has more than high members and its children average at least low
+timing_report = None #path of a JSON report with wall/CPU time, peak memory and throughput per stage (or --report); "{start}" is replaced by the start time, e.g. "./reports/run-{start}.json"
+log_level = "debug" #logs.txt detail: "debug" (every folder visited), "info" (tree files written), "warning" or "quiet" (no log file)
+log_format = "text" #logs.txt format: "text" or "jsonl" (one JSON object per message)
+profile_dir = None #write a cProfile .pstats and sampled collapsed stacks per stage to this directory (or --profile DIR)
+profile_memory = False #profile_dir only: also list the top tracemalloc allocators per stage (or --profile-memory; many times slower)
 
 # --- Namespaces ---
 SOSA = Namespace("http://www.w3.org/ns/sosa/")
@@ -27,6 +55,8 @@ LDES = Namespace("https://w3id.org/ldes#")
 TREE = Namespace("https://w3id.org/tree#")
 eventstream_uri = URIRef("https://shehabeldeenayman.github.io/Mol_sluis_Dessel_Usecase/")
 #view_uri = URIRef("https://shehabeldeenayman.github.io/Mol_sluis_Dessel_Usecase/data/data.ttl")
+metrics = RunMetrics() #stage timings of the current run, see ldes_metrics
+run_log = RunLog() #logs.txt of the current run, see ldes_log
 
 
 #RDF2LDES##############################################################################################
@@ -34,7 +64,10 @@ eventstream_uri = URIRef("https://shehabeldeenayman.github.io/Mol_sluis_Dessel_U
 def load_graph(input_path):
     """Load the RDF graph from a Turtle file."""
     g = Graph()
-    g.parse(input_path, format="turtle", publicID="https://example.org/")
+    # compressed (.gz/.bz2/.xz/.zst) sources are decompressed while rdflib reads them
+    with metrics.stage("parse", bytes=file_size(input_path)), open_source(input_path, binary=True) as source:
+        g.parse(source, format="turtle", publicID="https://example.org/")
+    metrics.count("parse", triples=len(g))
     return g
 
 
@@ -82,51 +115,180 @@ def extract_observations(g: Graph):
     return observations
 
 
-def divide_data(observations):
-    """Group observations by (year, month, day) and write one file per day."""
-    grouped = defaultdict(list)
-
-    # Group all observations by date
-    for obs, id_, result_value, property_, time_ in observations:
-        key = (time_.year, time_.month, time_.day)
-        grouped[key].append((obs, id_, result_value, property_, time_))
-
-    for (year, month, day), daily_obs in grouped.items():
-        file_path = os.path.join(base_path, f"{year}/{month:02d}/{day:02d}/readings.ttl")
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-        ds = Dataset()
-        ds.bind("sosa", SOSA)
-        ds.bind("ex", EX)
-        ds.bind("tss", TSS)
-        ds.bind("xsd", XSD)
-        ds.bind("ldes", LDES)
-        ds.bind("tree", TREE)
-        ds.bind("as", AS)
-        metadata_graph = ds.graph()
-        metadata_graph = ds.default_context
-
-        metadata_graph.add((eventstream_uri, RDF.type, LDES.EventStream))
-        metadata_graph.add((eventstream_uri, LDES.timestampPath, SOSA.resultTime))
-
-        metadata_graph.add((eventstream_uri, TREE.view, home_page))
-        #store = ConjunctiveGraph()
-
-        for obs, id_, result_value, property_, time_ in daily_obs:
-
-            g_snip = ds.graph(URIRef(f"{eventstream_uri}/{id_}"))
-
-            g_snip.add((obs, RDF.type, SOSA.Observation))
-            g_snip.add((obs, EX.id, Literal(id_, datatype=XSD.int)))
-            g_snip.add((obs, SOSA.hasSimpleResult, Literal(result_value, datatype=XSD.float)))
-            g_snip.add((obs, SOSA.observedProperty, Literal(property_)))
-            g_snip.add((obs, SOSA.resultTime, Literal(time_, datatype=XSD.dateTime)))
-
+def read_table(path, stream=False, cache=False):
+    """Parse one source file into an ObservationTable (runs in a worker process for multi-file input)."""
+    snapshot = SnapshotCache(path, "observations") if cache else None
+    table = None
+    if snapshot:
+        with metrics.stage("cache"):
+            table = snapshot.load_table()
+    if table is None:
+        if stream:
+            # parsing and extraction are interleaved: both count as "stream"
+            with metrics.stage("stream", bytes=file_size(path)):
+                table = ObservationTable.from_records(stream_observations(path))
+        else:
+            g = load_graph(path)
+            with metrics.stage("extract"):
+                table = ObservationTable.from_records(extract_observations(g))
+        metrics.count("stream" if stream else "extract", members=len(table))
+        if snapshot:
+            with metrics.stage("cache"):
+                snapshot.save_table(table)
+    return table
+
+
+def ingest(inputs, budget: MemoryBudget = None):
+    """
+    Read the source files into one ObservationTable. Out of core (or once the memory budget is
+    nearly used up) rows go to run files instead and (iterable of month tables, SpillBuckets) is returned.
+    """
+    if out_of_core or budget:
+        # divide_data() reads the run files back one month at a time
+        if len(inputs) > 1:
+            sources = iter_tables(inputs, read_table, (stream_input, snapshot_cache), ingest_workers)
+        elif stream_input:
+            sources = ObservationTable.chunks(stream_observations(inputs[0]), chunk_rows(spill_budget))
+        else:
+            sources = [read_table(inputs[0], False, snapshot_cache)]
+        return collect_tables(sources, spill_level(levels, bool(target_members)),
+                              None if out_of_core else budget, spill_dir)
+    if len(inputs) == 1:
+        return read_table(inputs[0], stream_input, snapshot_cache), None
+    # one worker per file; the per-file tables are merged before bucketing
+    return read_tables(inputs, read_table, (stream_input, snapshot_cache), ingest_workers), None
+
+
+def divide_data(tables, state: IncrementalState = None, journal: CheckpointJournal = None, budget: MemoryBudget = None):
+    """
+    Group observation rows by the configured levels and write one file per bucket.
+    tables is one ObservationTable or, out of core, an iterable of tables over disjoint time ranges.
+    """
+    index = BucketIndex()
+    for table in [tables] if isinstance(tables, ObservationTable) else tables:
+        write_buckets(table, index, state, journal, budget)
+
+    if state is not None:
+        for parts in state.removed():
+            file_path = os.path.join(base_path, *calendar_names(parts), "readings.ttl")
+            with metrics.stage("filesystem"):
+                remove_stale_pages(os.path.dirname(file_path), 0)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    try:
+                        os.removedirs(os.path.dirname(file_path))
+                    except OSError:
+                        pass
+
+    return index
+
+
+def write_buckets(table: ObservationTable, index: BucketIndex, state: IncrementalState = None, journal: CheckpointJournal = None,
+                  budget: MemoryBudget = None):
+    """Write the buckets of one table and add them to the index."""
+    # Group all rows in one sort; each bucket becomes a contiguous, time-sorted slice
+    with metrics.stage("group", members=len(table)):
+        buckets = partition_table(table, levels, target_members)
+        table = table.take(buckets.order)
+    jobs = []
+    # terms repeated on every observation are built once (Namespace attributes make a new URIRef per access)
+    property_literals = {property_: Literal(property_) for property_ in table.property_terms}
+    xsd_int, xsd_float, xsd_datetime = XSD.int, XSD.float, XSD.dateTime
+    observation_type, has_result, observed_property, result_time = (SOSA.Observation, SOSA.hasSimpleResult,
+                                                                    SOSA.observedProperty, SOSA.resultTime)
+    ex_id = EX.id
+
+    for parts, rows in buckets.slices():
+        bucket_dir = os.path.join(base_path, *calendar_names(parts))
+        with metrics.stage("filesystem"):
+            os.makedirs(bucket_dir, exist_ok=True)
+
+        if journal is not None:
+            # buckets are committed in time order, so the watermark never skips an unwritten day
+            plan, pages = journal.plan_pages(parts, table.times[rows], max_members)
+            files = [(os.path.join(page_dir(bucket_dir, page), "readings.ttl"), start, end) for page, start, end in plan]
+            journal.begin_bucket(parts, [file_path for file_path, _, _ in files])
+            for file_path, start, end in files:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with metrics.stage("serialize", members=end - start):
+                    write_observation_table(file_path + ".new", table, slice(rows.start + start, rows.start + end),
+                                               eventstream_uri, home_page, output_format)
+                metrics.count("serialize", bytes=file_size(file_path + ".new"))
+                with metrics.stage("filesystem"):
+                    append_fragment(file_path + ".new", file_path)
+            journal.commit_bucket(parts, pages)
+            continue
 
-        ds.serialize(destination=file_path, format="trig")
-        #temp_graph.serialize(destination=file_path, format="turtle")
-        # with open(file_path, "w", encoding="utf-8") as f:
-        #     f.write(temp_graph.serialize(format="nt"))
+        # over-full buckets are split into time-ordered pages; page 0 is the usual day file
+        fragments = [(os.path.join(page_dir(bucket_dir, page), "readings.ttl"), slice(rows.start + start, rows.start + end))
+                     for page, (start, end) in enumerate(page_bounds(table.times[rows], max_members))]
+
+        if state is not None:
+            min_time, max_time = buckets.time_range(rows)
+            digest = digest_table_rows(table, rows)
+            if not state.update(parts, digest, rows.stop - rows.start, min_time, max_time) and os.path.exists(fragments[0][0]):
+                continue
+
+        if max_members:
+            with metrics.stage("filesystem"):
+                remove_stale_pages(bucket_dir, len(fragments))
+
+        for file_path, part in fragments:
+            with metrics.stage("filesystem"):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            if workers > 1:
+                jobs.append((file_path, part))
+                continue
+
+            # a Dataset of this day would not fit in the memory budget: stream it with the template writer
+            if fast_writer or budget is not None and not budget.fits_dataset(part.stop - part.start):
+                with metrics.stage("serialize", members=part.stop - part.start):
+                    write_observation_table(file_path, table, part, eventstream_uri, home_page, output_format)
+                metrics.count("serialize", bytes=file_size(file_path))
+                continue
+
+            with metrics.stage("serialize", members=part.stop - part.start):
+                ds = Dataset()
+                ds.bind("sosa", SOSA)
+                ds.bind("ex", EX)
+                ds.bind("tss", TSS)
+                ds.bind("xsd", XSD)
+                ds.bind("ldes", LDES)
+                ds.bind("tree", TREE)
+                ds.bind("as", AS)
+                metadata_graph = ds.graph()
+                metadata_graph = ds.default_context
+
+                metadata_graph.add((eventstream_uri, RDF.type, LDES.EventStream))
+                metadata_graph.add((eventstream_uri, LDES.timestampPath, SOSA.resultTime))
+
+                metadata_graph.add((eventstream_uri, TREE.view, home_page))
+                #store = ConjunctiveGraph()
+
+                for obs, id_, result_value, property_, time_ in table.records(part):
+
+                    g_snip = ds.graph(URIRef(f"{eventstream_uri}/{id_}"))
+
+                    g_snip.add((obs, RDF.type, observation_type))
+                    g_snip.add((obs, ex_id, Literal(id_, datatype=xsd_int)))
+                    g_snip.add((obs, has_result, Literal(result_value, datatype=xsd_float)))
+                    g_snip.add((obs, observed_property, property_literals[property_]))
+                    g_snip.add((obs, result_time, Literal(time_, datatype=xsd_datetime)))
+
+
+                ds.serialize(destination=file_path, format="trig")
+            metrics.count("serialize", bytes=file_size(file_path))
+            #temp_graph.serialize(destination=file_path, format="turtle")
+            # with open(file_path, "w", encoding="utf-8") as f:
+            #     f.write(temp_graph.serialize(format="nt"))
+
+    if jobs:
+        with metrics.stage("serialize", members=sum(part.stop - part.start for _, part in jobs)):
+            write_observation_buckets(table, jobs, eventstream_uri, home_page, output_format, workers)
+        metrics.count("serialize", bytes=sum(file_size(file_path) for file_path, _ in jobs))
+
+    index.add_buckets(buckets, max_members)
 
 #RDF2LDES##############################################################################################
 directory = "LDES/"
@@ -146,23 +308,25 @@ def delete_ldes_files():
             os.remove(os.path.join(root, f"{Path(root).parts[-1]}.trig"))
 
 def create_ldes_files():
+    from dateutil.relativedelta import relativedelta
+
     for root, dirs, files in os.walk(directory):
         root = Path(root).as_posix()
         
         #print("Current folder:", root)
-        write_log(f"Current folder: {root} \n")
-        write_log(f"Current folder length: {len(Path(root).parts)} \n")
         path = Path(root)
+        run_log.debug("Current folder: %s \n", root)
+        run_log.debug("Current folder length: %d \n", len(path.parts))
         #print("Last Folder", path.parts[-1]) #File name maybe
-        write_log(f"Last part of directory {path.parts[-1]} \n")
+        run_log.debug("Last part of directory %s \n", path.parts[-1])
         #print("Subfolders:", dirs)
         #print("Subfolders:\n " + "\n ".join(dirs))
         # with open(os.path.join(root,f"{path.parts[-1]}.ttl"),'w') as file:
         #     pass
         temp_graph = create_base_graph()
         direct_subfolders = [Path(root) / d for d in dirs]
-        for folder in direct_subfolders:
-            write_log(f"  Subfolder: {folder.as_posix()}\n")
+        for folder in direct_subfolders if run_log.enabled("debug") else ():
+            run_log.debug("  Subfolder: %s\n", folder.as_posix())
             #print(len(Path(folder).parts),"\n")
        
         for d in dirs:
@@ -171,7 +335,7 @@ def create_ldes_files():
             #temp_graph.add((eventstream_uri, TREE.view, URIRef("")))
             temp_graph.add((eventstream_uri, TREE.view,home_page ))
             
-            write_log(f"Subfolder: {d} \n")
+            run_log.debug("Subfolder: %s \n", d)
             bn_ge = BNode()
             bn_lt = BNode()
             #######tree relation
@@ -228,13 +392,13 @@ def create_ldes_files():
         if len(Path(os.path.join(root, f"{path.parts[-1]}.trig")).parts) <= 4:
             with open(os.path.join(root,f"{path.parts[-1]}.trig"),'a') as file: # we should move the with open with file write to after the for loop. the for loop will only creat the greater than less than relations. It will add them to the base graph initialized before the loop, then it will be added to the graph and written after the graph.
                     #print(f" Writing to file: {os.path.join(root,f'{path.parts[-1]}.ttl')}")
-                    write_log(f"path parts: {len(Path(os.path.join(root, f"{path.parts[-1]}.trig")).parts)} \n")
-                    write_log(f" Writing to file: {Path(os.path.join(root,f'{path.parts[-1]}.trig')).as_posix()} \n")
+                    run_log.debug("path parts: %d \n", len(Path(os.path.join(root, f"{path.parts[-1]}.trig")).parts))
+                    run_log.info(" Writing to file: %s/%s.trig \n", root, path.parts[-1])
                     file.write(temp_graph.serialize(format="trig"))
 
         #print("Files:", files)
-        write_log("-" * 40)
-        write_log("\n")
+        run_log.debug("-" * 40)
+        run_log.debug("\n")
         #print("-" * 40)
 
 from rdflib import ConjunctiveGraph
@@ -268,12 +432,45 @@ def create_base_graph():
     
 
 
-def write_log(msg):
-    with open("logs.txt",'a') as file:
-        file.write(msg)
-def delete_log():
-    if(Path("logs.txt").exists()):
-        os.remove("logs.txt")
+
+
+#RDF2LDES##############################################################################################
+
+def open_state():
+    """IncrementalState of base_path; a change of these output or fragmentation settings rewrites every fragment."""
+    return IncrementalState(os.path.join(base_path, STATE_FILE), {"eventstream_uri": eventstream_uri, "base_uri": base_uri,
+                            "home_page": home_page, "fast_writer": fast_writer, "output_format": output_format,
+                            "max_members": max_members, "levels": levels, "target_members": target_members})
+
+
+def build_tree(index, state=None, journal=None):
+    """
+    Write the tree nodes above the fragments divide_data() wrote: the nodes above changed buckets
+    of an append-only (journal) or incremental (state) run, otherwise the whole tree.
+    """
+    run_log.start(log_level, log_format)
+    written = None
+    with metrics.stage("tree"):
+        if journal is not None:
+            written = write_tree_nodes(journal.index(), directory, base_uri, home_page, eventstream_uri, SOSA.observedProperty,
+                                       create_base_graph, log=run_log.info, only=journal.dirty_nodes())
+            journal.commit_tree()
+            journal.compact()
+        elif state is not None:
+            written = write_tree_nodes(index, directory, base_uri, home_page, eventstream_uri, SOSA.observedProperty,
+                                       create_base_graph, log=run_log.info, only=state.dirty_nodes())
+            state.save()
+        elif tree_from_index or max_members or target_members or tuple(levels) != ("year", "month", "day"):
+            # create_ldes_files() only knows the year/month/day layout
+            written = write_tree_nodes(index, directory, base_uri, home_page, eventstream_uri, SOSA.observedProperty,
+                                       create_base_graph, log=run_log.info)
+        else:
+            with metrics.stage("filesystem"):
+                delete_ldes_files()
+            create_ldes_files()
+    if written is not None:
+        metrics.count("tree", nodes=len(written), bytes=sum(file_size(file_name) for file_name in written))
+    run_log.close()
 
 
 #RDF2LDES##############################################################################################
@@ -281,22 +478,66 @@ def delete_log():
 def main():
 ######################################################################
     start_time = time.perf_counter()
-    g = load_graph(input_path)
-    observations = extract_observations(g)
-    divide_data(observations)
+    profiler = None
+    if profile_dir:
+        from ldes_profile import StageProfiler  # cProfile and the sampler only load when profiling
+        profiler = StageProfiler(profile_dir, trace_memory=profile_memory)
+    metrics.start({"script": "RDF2LDES_V2", "input_path": input_path, "base_path": base_path, "levels": levels,
+                   "stream_input": stream_input, "out_of_core": out_of_core, "fast_writer": fast_writer,
+                   "output_format": output_format, "workers": workers, "incremental": incremental, "append_only": append_only}, profiler)
+    state = open_state() if incremental else None
+    inputs = expand_inputs(input_path)
+    budget = MemoryBudget(parse_size(max_memory)) if max_memory else None
+    # "ingest" spans the whole read phase (parse / extract / cache / spill, or worker processes for several files)
+    with metrics.stage("ingest"):
+        tables, spill = ingest(inputs, budget)
+    metrics.count("ingest", members=sum(spill.counts.values()) if spill else len(tables))
+    journal = None
+    if append_only:
+        if target_members:
+            raise ValueError("target_members picks the depth from the whole data set and cannot be used with append_only")
+        journal = CheckpointJournal(os.path.join(base_path, JOURNAL_FILE))
+        watermark = journal.watermark
+        if spill:
+            tables = (table.newer_than(watermark) for table in tables)
+        else:
+            tables = tables.newer_than(watermark)
+    try:
+        index = divide_data(tables, state, journal, budget)
+    finally:
+        if spill:
+            spill.close()
     end_time = time.perf_counter()
     print(f"Processing completed in {end_time - start_time:.2f} seconds.")
 ######################################################################
     start_time = time.perf_counter()
-    delete_log()
-    delete_ldes_files()
-    create_ldes_files()
+    build_tree(index, state, journal)
     end_time = time.perf_counter()
     print(f"Processing completed in {end_time - start_time:.2f} seconds.")
+    if timing_report:
+        print(f"Timing report: {metrics.report(timing_report)}")
+    if profile_dir:
+        print(f"Profile: {metrics.profiler.write()}")
 ######################################################################
 
 
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fragment SOSA observations into an LDES.")
+    parser.add_argument("--max-memory", type=parse_size, help="memory budget, e.g. 8G; rows are spilled to disk before it is used up")
+    parser.add_argument("--report", help="write a JSON timing report per stage to this path")
+    parser.add_argument("--profile", metavar="DIR", help="write cProfile and collapsed stack output per stage to DIR")
+    parser.add_argument("--profile-memory", action="store_true", help="with --profile: also the top tracemalloc allocators per stage")
+    args = parser.parse_args()
+    if args.max_memory:
+        max_memory = args.max_memory
+    if args.report:
+        timing_report = args.report
+    if args.profile:
+        profile_dir = args.profile
+    if args.profile_memory:
+        profile_memory = True
     main()
@@ -1,24 +1,54 @@
 from rdflib import Graph,URIRef,Namespace,BNode,Literal,Dataset
 from rdflib.namespace import XSD,RDF
 from rdflib.term import BNode
-import pandas as pd
-import argparse
-from collections import defaultdict
+from itertools import product
 from datetime import datetime, timezone,timedelta
-import json
 import os
-import calendar
 import time
 from pathlib import Path
-from dateutil.relativedelta import relativedelta
-
-
-input_path = "./sources/Mol_Sluis_Dessel_data_TSS_per_day.ttl"
+from ldes_buckets import partition_datetimes
+from ldes_writer import write_snippet_fragment
+from ldes_inputs import expand_inputs
+from ldes_parallel import write_snippet_buckets, SNIPPET_FIELDS, read_snippet_rows
+from ldes_tree import BucketIndex, write_tree_nodes, page_bounds, page_dir, remove_stale_pages, calendar_names
+from ldes_state import IncrementalState, STATE_FILE, digest_rows, CheckpointJournal, JOURNAL_FILE, append_fragment
+from ldes_table import datetime_to_ns
+from ldes_stream import open_source
+from ldes_cache import SnapshotCache
+from ldes_memory import MemoryBudget, parse_size
+from ldes_metrics import RunMetrics, file_size
+from ldes_log import RunLog
+
+
+input_path = "./sources/Mol_Sluis_Dessel_data_TSS_per_day.ttl" #a file, a directory, a glob such as "./sources/*.ttl.gz" or a list of those
 base_path = "./LDESTSS"
+fast_writer = False #format fragments from templates instead of building and serializing a Dataset per day
+output_format = "trig" #fast writer only: "trig" or "nquads"
+workers = 1 #more than 1 writes day fragments in a process pool (largest days first, always with the fast writer)
+tree_from_index = False #build the tree nodes from the buckets divide_data wrote instead of walking the output directory
+incremental = False #only rewrite day fragments whose content changed and the tree nodes above them (state kept in base_path)
+append_only = False #only ingest snippets newer than the tss:from watermark and append them; resumes after a crash
+ingest_workers = None #processes parsing the source files when input_path names several (None: one per CPU)
+snapshot_cache = False #keep the extracted snippet rows in a memory-mapped snapshot next to the source; an unchanged source is not parsed again
+max_memory = None #memory budget in bytes (or --max-memory 8G): days whose Dataset would not fit are written by the template writer
+direct_extract = False #walk the tss:about links through the graph's triple indexes instead of running the SPARQL join
+max_members = None #split days with more snippets into time-ordered pages (needs the index based tree)
+levels = ("year", "month", "day") #fragment levels from the root down, any prefix of year/month/day/hour; e.g. ("year", "month") for one file per month
+target_members = None #(low, high): pick the depth per subtree, a bucket is split into the next level only when it has more than high members and its children average at least low
+timing_report = None #path of a JSON report with wall/CPU time, peak memory and throughput per stage (or --report); "{start}" is replaced by the start time, e.g. "./reports/run-{start}.json"
+log_level = "debug" #logs.txt detail: "debug" (every folder visited), "info" (tree files written), "warning" or "quiet" (no log file)
+log_format = "text" #logs.txt format: "text" or "jsonl" (one JSON object per message)
+profile_dir = None #write a cProfile .pstats and sampled collapsed stacks per stage to this directory (or --profile DIR)
+profile_memory = False #profile_dir only: also list the top tracemalloc allocators per stage (or --profile-memory; many times slower)
+metrics = RunMetrics() #stage timings of the current run, see ldes_metrics
+run_log = RunLog() #logs.txt of the current run, see ldes_log
 
 def load_graph(input_path):
     g = Graph()
-    g.parse(input_path, format="turtle", publicID="https://example.org/")
+    # compressed (.gz/.bz2/.xz/.zst) sources are decompressed while rdflib reads them
+    with metrics.stage("parse", bytes=file_size(input_path)), open_source(input_path, binary=True) as source:
+        g.parse(source, format="turtle", publicID="https://example.org/")
+    metrics.count("parse", triples=len(g))
     return g
 
 def process_graph(graph):
@@ -42,98 +72,222 @@ WHERE {
               sosa:observedProperty ?observedProperty .
 }
 """
-    result = graph.query(query)
-    print(f"Total snippets processed: {len(result)}")
+    return graph.query(query)  # evaluated once, when read_rows() collects the rows
+
+
+def extract_snippets(graph):
+    """
+    Yield the same rows as process_graph() without SPARQL: snippets are found through the
+    rdf:type index, their tss:about template is resolved once and reused by every snippet
+    pointing at it. Rows are plain dicts keyed like the SPARQL variables. read_rows() collects
+    them in one list: bucketing sorts all snippets by tss:from before the first day is written.
+    """
+    TSS = Namespace("https://w3id.org/tss#")
+    SOSA = Namespace("http://www.w3.org/ns/sosa/")
+    templates = {}
+
+    def template_rows(template):
+        rows = templates.get(template)
+        if rows is None:
+            rows = templates[template] = []
+            if (template, RDF.type, TSS.PointTemplate) in graph:
+                rows.extend({"template": template, "sensor": sensor, "observedProperty": property_}
+                            for sensor in graph.objects(template, SOSA.madeBySensor)
+                            for property_ in graph.objects(template, SOSA.observedProperty))
+        return rows
+
+    for snippet in graph.subjects(RDF.type, TSS.Snippet):
+        # every value combination, as the join would produce (normally exactly one)
+        values = [list(graph.objects(snippet, predicate))
+                  for predicate in (TSS["from"], TSS.to, TSS.pointType, TSS.points)]
+        if not all(values):
+            continue
+        for template in graph.objects(snippet, TSS.about):
+            for template_row in template_rows(template):
+                for from_time, to_time, point_type, points in product(*values):
+                    yield {"snippet": snippet, "fromTime": from_time, "toTime": to_time,
+                           "pointType": point_type, "pointsJson": points, **template_row}
+
+
+def read_rows(path, direct=False, cache=False):
+    """Snippet rows of one source file (runs in a worker process for multi-file input)."""
+    snapshot = SnapshotCache(path, "snippets") if cache else None
+    result = None
+    if snapshot:
+        with metrics.stage("cache"):
+            result = snapshot.load_rows()
+    if result is None:
+        original_graph = load_graph(path)
+        with metrics.stage("extract"):
+            result = list(extract_snippets(original_graph) if direct else process_graph(original_graph))
+        print(f"Total snippets processed: {len(result)}")
+        metrics.count("extract", members=len(result))
+        if snapshot:
+            with metrics.stage("cache"):
+                snapshot.save_rows(result, SNIPPET_FIELDS)
     return result
 
 
-def divide_data(result):
+def ingest(inputs):
+    """Snippet rows of all source files."""
+    if len(inputs) == 1:
+        return read_rows(inputs[0], direct_extract, snapshot_cache)
+    # one worker per file; the rows come back encoded and are merged before bucketing
+    return read_snippet_rows(inputs, read_rows, (direct_extract, snapshot_cache), ingest_workers)
+
+
+def divide_data(result, state=None, journal=None, budget=None):
     SOSA = Namespace("http://www.w3.org/ns/sosa/")
     EX = Namespace("http://example.org/")
     TSS = Namespace("https://w3id.org/tss#")
 
-    grouped = defaultdict(list)
-
-    # group by date
-    for row in result:
-        dt = datetime.fromisoformat(str(row['fromTime'].toPython()))
-        key = (dt.year, dt.month, dt.day)
-        grouped[key].append(row)
-
-    # process one dataset per day
-    for (year, month, day), rows in grouped.items():
-
-        ds = Dataset()
-        ds.bind("sosa", SOSA)
-        ds.bind("ex", EX)
-        ds.bind("tss", TSS)
-        ds.bind("xsd", XSD)
-        ds.bind("ldes", LDES)
-        ds.bind("tree", TREE)
-        ds.bind("as", AS)
-        metadata_graph = ds.graph()
-        metadata_graph = ds.default_context
-
-        #retention_policy = BNode()
-
-        metadata_graph.add((eventstream_uri, RDF.type, LDES.EventStream))
-        metadata_graph.add((eventstream_uri, LDES.timestampPath, TSS["from"]))
-        #metadata_graph.add((base_uri, LDES.versionCreateObject, AS.Create))
-        #metadata_graph.add((base_uri, LDES.versionDeleteObject, AS.Delete))
-        #metadata_graph.add((base_uri, LDES.versionOfPath, AS.object))
-        #metadata_graph.add((base_uri, LDES.retentionPolicy, retention_policy))
-
-        #metadata_graph.add((retention_policy, RDF.type, LDES.LatestVersionSubset))
-        #metadata_graph.add((retention_policy, LDES.amount, Literal(1, datatype=XSD.integer)))
-        #metadata_graph.add((base_uri, TREE.view, URIRef(f"{base_uri}{year:04d}/{month:02d}/{day:02d}/readings.trig")))
-        metadata_graph.add((eventstream_uri, TREE.view, home_page))
-
-        for row in rows:
-
-            snippet_iri = row["snippet"]
-            template_bnode = row["template"]        # this is already a BlankNode
-            sensor = row["sensor"]
-            observedProperty = row["observedProperty"]
-
-            # Named graph for this snippet
-            g_snip = ds.graph(snippet_iri)
-
-            # -----------------------------
-            # Add snippet triples
-            # -----------------------------
-            g_snip.add((snippet_iri, RDF.type, TSS.Snippet))
-            g_snip.add((snippet_iri, TSS.about, template_bnode))
-            g_snip.add((snippet_iri, TSS["from"], Literal(row["fromTime"].toPython(), datatype=XSD.dateTime)))
-            g_snip.add((snippet_iri, TSS.to, Literal(row["toTime"].toPython(), datatype=XSD.dateTime)))
-            g_snip.add((snippet_iri, TSS.pointType, Literal(row["pointType"])))
-            g_snip.add((snippet_iri, TSS.points, Literal(row["pointsJson"])))
-
-            # -----------------------------
-            # Add PointTemplate into the SAME graph
-            # -----------------------------
-            g_snip.add((template_bnode, RDF.type, TSS.PointTemplate))
-            g_snip.add((template_bnode, SOSA.madeBySensor, sensor))
-            g_snip.add((template_bnode, SOSA.observedProperty, observedProperty))
-
-            # -----------------------------
-            # Add TSS member to metadat graph
-            # -----------------------------
-            metadata_graph.add((eventstream_uri,TREE.member,snippet_iri))
-            #metadata_graph.add((snippet_iri,RDF.type, AS.Create))
-            #metadata_graph.add((snippet_iri, AS.object, snippet_iri))
-            metadata_graph.add((snippet_iri, TSS["from"], Literal(row["fromTime"].toPython(), datatype=XSD.dateTime)))
-
-
-
-        # output path
-        file_path = os.path.join(
-            base_path,
-            f"{year:04d}", f"{month:02d}", f"{day:02d}",
-            "readings.trig"
-        )
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-        ds.serialize(destination=file_path, format="trig")
+    if not isinstance(result, list):  # e.g. a SPARQL result; the rows of read_rows() are used as they are
+        result = list(result)
+    with metrics.stage("group", members=len(result)):
+        from_times = [datetime.fromisoformat(str(row['fromTime'].toPython())) for row in result]
+
+        if journal is not None and journal.watermark is not None:
+            keep = [i for i, dt in enumerate(from_times) if datetime_to_ns(dt) > journal.watermark]
+            result = [result[i] for i in keep]
+            from_times = [from_times[i] for i in keep]
+
+        # group by date in one sort; snippets of a bucket come out ordered by tss:from
+        buckets = partition_datetimes(from_times, levels, target_members)
+
+    jobs = []
+
+    # process one dataset per bucket
+    for parts, indices in buckets.rows():
+        rows = [result[i] for i in indices.tolist()]
+        times = buckets.times[indices]
+        bucket_dir = os.path.join(base_path, *calendar_names(parts))
+
+        if journal is not None:
+            # buckets are committed in time order, so the watermark never skips an unwritten day
+            plan, pages = journal.plan_pages(parts, times, max_members)
+            files = [(os.path.join(page_dir(bucket_dir, page), "readings.trig"), start, end) for page, start, end in plan]
+            journal.begin_bucket(parts, [file_path for file_path, _, _ in files])
+            for file_path, start, end in files:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with metrics.stage("serialize", members=end - start):
+                    write_snippet_fragment(file_path + ".new", rows[start:end], eventstream_uri, home_page, output_format)
+                metrics.count("serialize", bytes=file_size(file_path + ".new"))
+                with metrics.stage("filesystem"):
+                    append_fragment(file_path + ".new", file_path)
+            journal.commit_bucket(parts, pages)
+            continue
+
+        # over-full buckets are split into time-ordered pages; page 0 is the usual day file
+        fragments = [(os.path.join(page_dir(bucket_dir, page), "readings.trig"), rows[start:end])
+                     for page, (start, end) in enumerate(page_bounds(times, max_members))]
+
+        if state is not None:
+            min_time, max_time = int(times[0]), int(times[-1])
+            digest = digest_rows(rows, ("snippet", "template", "sensor", "observedProperty", "fromTime", "toTime", "pointType", "pointsJson"))
+            if not state.update(parts, digest, len(rows), min_time, max_time) and os.path.exists(fragments[0][0]):
+                continue
+
+        if max_members:
+            with metrics.stage("filesystem"):
+                remove_stale_pages(bucket_dir, len(fragments))
+
+        for file_path, rows in fragments:
+            with metrics.stage("filesystem"):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            if workers > 1:
+                jobs.append((file_path, rows))
+                continue
+
+            # a Dataset of this day would not fit in the memory budget: stream it with the template writer
+            if fast_writer or budget is not None and not budget.fits_dataset(len(rows)):
+                with metrics.stage("serialize", members=len(rows)):
+                    write_snippet_fragment(file_path, rows, eventstream_uri, home_page, output_format)
+                metrics.count("serialize", bytes=file_size(file_path))
+                continue
+
+            with metrics.stage("serialize", members=len(rows)):
+                ds = Dataset()
+                ds.bind("sosa", SOSA)
+                ds.bind("ex", EX)
+                ds.bind("tss", TSS)
+                ds.bind("xsd", XSD)
+                ds.bind("ldes", LDES)
+                ds.bind("tree", TREE)
+                ds.bind("as", AS)
+                metadata_graph = ds.graph()
+                metadata_graph = ds.default_context
+
+                #retention_policy = BNode()
+
+                metadata_graph.add((eventstream_uri, RDF.type, LDES.EventStream))
+                metadata_graph.add((eventstream_uri, LDES.timestampPath, TSS["from"]))
+                #metadata_graph.add((base_uri, LDES.versionCreateObject, AS.Create))
+                #metadata_graph.add((base_uri, LDES.versionDeleteObject, AS.Delete))
+                #metadata_graph.add((base_uri, LDES.versionOfPath, AS.object))
+                #metadata_graph.add((base_uri, LDES.retentionPolicy, retention_policy))
+
+                #metadata_graph.add((retention_policy, RDF.type, LDES.LatestVersionSubset))
+                #metadata_graph.add((retention_policy, LDES.amount, Literal(1, datatype=XSD.integer)))
+                #metadata_graph.add((base_uri, TREE.view, URIRef(f"{base_uri}{year:04d}/{month:02d}/{day:02d}/readings.trig")))
+                metadata_graph.add((eventstream_uri, TREE.view, home_page))
+
+                for row in rows:
+
+                    snippet_iri = row["snippet"]
+                    template_bnode = row["template"]        # this is already a BlankNode
+                    sensor = row["sensor"]
+                    observedProperty = row["observedProperty"]
+
+                    # Named graph for this snippet
+                    g_snip = ds.graph(snippet_iri)
+
+                    # -----------------------------
+                    # Add snippet triples
+                    # -----------------------------
+                    g_snip.add((snippet_iri, RDF.type, TSS.Snippet))
+                    g_snip.add((snippet_iri, TSS.about, template_bnode))
+                    g_snip.add((snippet_iri, TSS["from"], Literal(row["fromTime"].toPython(), datatype=XSD.dateTime)))
+                    g_snip.add((snippet_iri, TSS.to, Literal(row["toTime"].toPython(), datatype=XSD.dateTime)))
+                    g_snip.add((snippet_iri, TSS.pointType, Literal(row["pointType"])))
+                    g_snip.add((snippet_iri, TSS.points, Literal(row["pointsJson"])))
+
+                    # -----------------------------
+                    # Add PointTemplate into the SAME graph
+                    # -----------------------------
+                    g_snip.add((template_bnode, RDF.type, TSS.PointTemplate))
+                    g_snip.add((template_bnode, SOSA.madeBySensor, sensor))
+                    g_snip.add((template_bnode, SOSA.observedProperty, observedProperty))
+
+                    # -----------------------------
+                    # Add TSS member to metadat graph
+                    # -----------------------------
+                    metadata_graph.add((eventstream_uri,TREE.member,snippet_iri))
+                    #metadata_graph.add((snippet_iri,RDF.type, AS.Create))
+                    #metadata_graph.add((snippet_iri, AS.object, snippet_iri))
+                    metadata_graph.add((snippet_iri, TSS["from"], Literal(row["fromTime"].toPython(), datatype=XSD.dateTime)))
+
+                ds.serialize(destination=file_path, format="trig")
+            metrics.count("serialize", bytes=file_size(file_path))
+
+    if jobs:
+        with metrics.stage("serialize", members=sum(len(rows) for _, rows in jobs)):
+            write_snippet_buckets(jobs, eventstream_uri, home_page, output_format, workers)
+        metrics.count("serialize", bytes=sum(file_size(file_path) for file_path, _ in jobs))
+
+    if state is not None:
+        for parts in state.removed():
+            file_path = os.path.join(base_path, *calendar_names(parts), "readings.trig")
+            with metrics.stage("filesystem"):
+                remove_stale_pages(os.path.dirname(file_path), 0)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    try:
+                        os.removedirs(os.path.dirname(file_path))
+                    except OSError:
+                        pass
+
+    return BucketIndex.from_buckets(buckets, max_members)
 
 
 
@@ -153,23 +307,25 @@ def delete_ldes_files():
             os.remove(os.path.join(root, f"{Path(root).parts[-1]}.trig"))
 
 def create_ldes_files():
+    from dateutil.relativedelta import relativedelta
+
     for root, dirs, files in os.walk(directory):
         root = Path(root).as_posix()
         
         #print("Current folder:", root)
-        write_log(f"Current folder: {root} \n")
-        write_log(f"Current folder length: {len(Path(root).parts)} \n")
         path = Path(root)
+        run_log.debug("Current folder: %s \n", root)
+        run_log.debug("Current folder length: %d \n", len(path.parts))
         #print("Last Folder", path.parts[-1]) #File name maybe
-        write_log(f"Last part of directory {path.parts[-1]} \n")
+        run_log.debug("Last part of directory %s \n", path.parts[-1])
         #print("Subfolders:", dirs)
         #print("Subfolders:\n " + "\n ".join(dirs))
         # with open(os.path.join(root,f"{path.parts[-1]}.ttl"),'w') as file:
         #     pass
         temp_graph = create_base_graph()
         direct_subfolders = [Path(root) / d for d in dirs]
-        for folder in direct_subfolders:
-            write_log(f"  Subfolder: {folder.as_posix()}\n")
+        for folder in direct_subfolders if run_log.enabled("debug") else ():
+            run_log.debug("  Subfolder: %s\n", folder.as_posix())
             #print(len(Path(folder).parts),"\n")
        
         for d in dirs:
@@ -178,7 +334,7 @@ def create_ldes_files():
             #temp_graph.add((eventstream_uri, TREE.view, URIRef("")))
             temp_graph.add((eventstream_uri, TREE.view,home_page ))
             
-            write_log(f"Subfolder: {d} \n")
+            run_log.debug("Subfolder: %s \n", d)
             bn_ge = BNode()
             bn_lt = BNode()
             #######tree relation
@@ -235,13 +391,13 @@ def create_ldes_files():
         if len(Path(os.path.join(root, f"{path.parts[-1]}.trig")).parts) <= 4:
             with open(os.path.join(root,f"{path.parts[-1]}.trig"),'a') as file: # we should move the with open with file write to after the for loop. the for loop will only creat the greater than less than relations. It will add them to the base graph initialized before the loop, then it will be added to the graph and written after the graph.
                     #print(f" Writing to file: {os.path.join(root,f'{path.parts[-1]}.ttl')}")
-                    write_log(f"path parts: {len(Path(os.path.join(root, f"{path.parts[-1]}.trig")).parts)} \n")
-                    write_log(f" Writing to file: {Path(os.path.join(root,f'{path.parts[-1]}.trig')).as_posix()} \n")
+                    run_log.debug("path parts: %d \n", len(Path(os.path.join(root, f"{path.parts[-1]}.trig")).parts))
+                    run_log.info(" Writing to file: %s/%s.trig \n", root, path.parts[-1])
                     file.write(temp_graph.serialize(format="trig"))
 
         #print("Files:", files)
-        write_log("-" * 40)
-        write_log("\n")
+        run_log.debug("-" * 40)
+        run_log.debug("\n")
         #print("-" * 40)
 
 from rdflib import ConjunctiveGraph
@@ -275,12 +431,45 @@ def create_base_graph():
     
 
 
-def write_log(msg):
-    with open("logs.txt",'a') as file:
-        file.write(msg)
-def delete_log():
-    if(Path("logs.txt").exists()):
-        os.remove("logs.txt")
+
+#RDF2LDES##############################################################################################
+
+def open_state():
+    """IncrementalState of base_path; a change of these output or fragmentation settings rewrites every fragment."""
+    return IncrementalState(os.path.join(base_path, STATE_FILE), {"eventstream_uri": eventstream_uri, "base_uri": base_uri,
+                            "home_page": home_page, "fast_writer": fast_writer, "output_format": output_format,
+                            "max_members": max_members, "levels": levels, "target_members": target_members})
+
+
+def build_tree(index, state=None, journal=None):
+    """
+    Write the tree nodes above the fragments divide_data() wrote: the nodes above changed buckets
+    of an append-only (journal) or incremental (state) run, otherwise the whole tree.
+    """
+    run_log.start(log_level, log_format)
+    written = None
+    with metrics.stage("tree"):
+        if journal is not None:
+            written = write_tree_nodes(journal.index(), directory, base_uri, home_page, eventstream_uri, TSS["from"],
+                                       create_base_graph, log=run_log.info, only=journal.dirty_nodes())
+            journal.commit_tree()
+            journal.compact()
+        elif state is not None:
+            written = write_tree_nodes(index, directory, base_uri, home_page, eventstream_uri, TSS["from"],
+                                       create_base_graph, log=run_log.info, only=state.dirty_nodes())
+            state.save()
+        elif tree_from_index or max_members or target_members or tuple(levels) != ("year", "month", "day"):
+            # create_ldes_files() only knows the year/month/day layout
+            written = write_tree_nodes(index, directory, base_uri, home_page, eventstream_uri, TSS["from"],
+                                       create_base_graph, log=run_log.info)
+        else:
+            with metrics.stage("filesystem"):
+                delete_ldes_files()
+            create_ldes_files()
+    if written is not None:
+        metrics.count("tree", nodes=len(written), bytes=sum(file_size(file_name) for file_name in written))
+    run_log.close()
+
 
 #RDF2LDES##############################################################################################
         
@@ -288,20 +477,53 @@ def main():
 ######################################################################
     print("Starting processing...")
     start_time = time.perf_counter()
-    original_graph = load_graph(input_path)
-    result = process_graph(original_graph)
-    divide_data(result)
+    profiler = None
+    if profile_dir:
+        from ldes_profile import StageProfiler  # cProfile and the sampler only load when profiling
+        profiler = StageProfiler(profile_dir, trace_memory=profile_memory)
+    metrics.start({"script": "RDF2LDES_YMD_SPARQL_FOR_TSS_V3", "input_path": input_path, "base_path": base_path,
+                   "levels": levels, "direct_extract": direct_extract, "fast_writer": fast_writer, "output_format": output_format,
+                   "workers": workers, "incremental": incremental, "append_only": append_only}, profiler)
+    state = open_state() if incremental else None
+    inputs = expand_inputs(input_path)
+    # "ingest" spans the whole read phase (parse / extract / cache, or worker processes for several files)
+    with metrics.stage("ingest"):
+        result = ingest(inputs)
+    metrics.count("ingest", members=len(result))
+    if append_only and target_members:
+        raise ValueError("target_members picks the depth from the whole data set and cannot be used with append_only")
+    journal = CheckpointJournal(os.path.join(base_path, JOURNAL_FILE)) if append_only else None
+    budget = MemoryBudget(parse_size(max_memory)) if max_memory else None
+    index = divide_data(result, state, journal, budget)
     end_time = time.perf_counter()
     print(f"Processing completed in {end_time - start_time:.2f} seconds.")
 ######################################################################
     start_time = time.perf_counter()
-    delete_log()
-    delete_ldes_files()
-    create_ldes_files()
+    build_tree(index, state, journal)
     end_time = time.perf_counter()
     print(f"Processing completed in {end_time - start_time:.2f} seconds.")
+    if timing_report:
+        print(f"Timing report: {metrics.report(timing_report)}")
+    if profile_dir:
+        print(f"Profile: {metrics.profiler.write()}")
 ######################################################################
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fragment TSS snippets into an LDES.")
+    parser.add_argument("--max-memory", type=parse_size, help="memory budget, e.g. 8G; big days skip the rdflib Dataset before it is used up")
+    parser.add_argument("--report", help="write a JSON timing report per stage to this path")
+    parser.add_argument("--profile", metavar="DIR", help="write cProfile and collapsed stack output per stage to DIR")
+    parser.add_argument("--profile-memory", action="store_true", help="with --profile: also the top tracemalloc allocators per stage")
+    args = parser.parse_args()
+    if args.max_memory:
+        max_memory = args.max_memory
+    if args.report:
+        timing_report = args.report
+    if args.profile:
+        profile_dir = args.profile
+    if args.profile_memory:
+        profile_memory = True
     main()
 
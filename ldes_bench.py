@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from ldes_synthetic import write_observations, write_snippets
+
+# Reproducible benchmarks.
+# Synthetic SOSA and TSS sources (ldes_synthetic) of a few preset sizes are generated once into a
+# data directory; every engine (an ldes_pipeline setup) then fragments each source in a
+# fresh Python process, so module state, caches and peak RSS never leak between runs. Timings
+# and peak memory come from the run's timing report (ldes_metrics); the fastest of --repeat
+# runs is kept. Results are printed as a table and optionally written as JSON.
+#
+#   python ldes_bench.py --sizes small,medium --engines fast,direct-fast --output bench.json
+#
+# Regression gate: --compare reruns the workload recorded in a results file (sizes, engines,
+# seed, repeat) and fails when the total or a stage got slower, throughput dropped or peak memory
+# grew by more than the tolerance. bench_baseline.json holds the gate workload; refresh it on
+# the machine that runs the gate with
+#
+#   python ldes_bench.py --sizes medium --engines fast,stream-fast,out-of-core,direct-fast --repeat 3 --output bench_baseline.json
+#
+# Start-up budget: --startup times the runs whose cost is mostly interpreter and import start-up
+# (ldes_pipeline --help and an incremental run over unchanged sources) and fails when either
+# takes more than its budget on top of a bare "python -c pass". The plain imports of the scripts
+# (rdflib, NumPy) are reported alongside for reference.
+
+BENCH_VERSION = 1
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PARALLEL = max(2, os.cpu_count() or 1)
+
+SIZES = {
+    "small": {"days": 7, "sensors": 2, "properties": 2, "readings": 24},  # 672 members
+    "medium": {"days": 30, "sensors": 4, "properties": 3, "readings": 24},  # 8 640 members
+    "large": {"days": 90, "sensors": 4, "properties": 3, "readings": 96},  # 103 680 members
+}
+
+# name -> (dataset, Pipeline settings, largest member count worth running)
+ENGINES = {
+    "rdflib": ("sosa", {"shape": "sosa", "engine": "direct", "writer": "rdflib"}, None),
+    "stream": ("sosa", {"shape": "sosa", "engine": "stream", "writer": "rdflib"}, None),
+    "fast": ("sosa", {"shape": "sosa", "engine": "direct", "writer": "fast", "tree_from_index": True}, None),
+    "stream-fast": ("sosa", {"shape": "sosa", "engine": "stream", "writer": "fast", "tree_from_index": True}, None),
+    "parallel": ("sosa", {"shape": "sosa", "engine": "stream", "writer": "fast", "tree_from_index": True,
+                          "workers": PARALLEL}, None),
+    "out-of-core": ("sosa", {"shape": "sosa", "engine": "stream", "writer": "fast", "tree_from_index": True,
+                             "out_of_core": True}, None),
+    "sparql": ("tss", {"shape": "tss", "engine": "sparql", "writer": "rdflib"}, 2_000),  # the SPARQL join grows quadratically
+    "direct": ("tss", {"shape": "tss", "engine": "direct", "writer": "rdflib"}, None),
+    "direct-fast": ("tss", {"shape": "tss", "engine": "direct", "writer": "fast", "tree_from_index": True}, None),
+    "direct-parallel": ("tss", {"shape": "tss", "engine": "direct", "writer": "fast", "tree_from_index": True,
+                                "workers": PARALLEL}, None),
+}
+
+STARTUP_RUNS = 5  # the fastest is kept
+STARTUP_BUDGET = {"help": 0.15, "no-op": 0.15}  # seconds on top of the interpreter start
+
+
+def member_count(size):
+    return size["days"] * size["sensors"] * size["properties"] * size["readings"]
+
+
+def dataset_path(data_dir, dataset, size, seed=0):
+    """Generate the synthetic source of a dataset ("sosa" or "tss") and size once; returns its path."""
+    name = f"{dataset}-{size['days']}d-{size['sensors']}s-{size['properties']}p-{size['readings']}r-{seed}.ttl"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        write = write_observations if dataset == "sosa" else write_snippets
+        write(tmp_path, seed=seed, **size)
+        os.replace(tmp_path, path)
+    return path
+
+
+def run_child(spec):
+    """Body of the benchmark process: run one engine's pipeline."""
+    sys.path.insert(0, REPO_DIR)
+    from ldes_pipeline import Pipeline
+
+    os.chdir(spec["work_dir"])  # logs.txt and the output stay in the scratch directory
+    Pipeline(**spec["pipeline"], timing_report=spec["report"]).run(spec["input_path"], "OUT")
+
+
+def run_engine(engine, input_path, timeout=None):
+    """Run one engine over one source in a new process; returns its timing report."""
+    _, pipeline, _ = ENGINES[engine]
+    work_dir = tempfile.mkdtemp(prefix="ldes-bench-")
+    try:
+        spec = {"pipeline": pipeline, "input_path": os.path.abspath(input_path),
+                "work_dir": work_dir, "report": os.path.join(work_dir, "report.json")}
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                       check=True, stdout=subprocess.DEVNULL, timeout=timeout)
+        with open(spec["report"], "r", encoding="utf-8") as file:
+            return json.load(file)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def summarize(report):
+    """Benchmark figures of one timing report."""
+    stages = report["stages"]
+    members = stages.get("ingest", {}).get("items", {}).get("members", 0)
+    result = {"wall_s": report["wall_s"], "cpu_s": report["cpu_s"] + report["child_cpu_s"],
+              "peak_rss": report["peak_rss"], "members": members,
+              "members_per_s": round(members / report["wall_s"], 1) if report["wall_s"] else None,
+              "stages": {name: stage["wall_s"] for name, stage in stages.items()}}
+    triples = stages.get("parse", {}).get("items", {}).get("triples")
+    if triples:
+        result["triples_per_s"] = round(triples / stages["parse"]["wall_s"], 1)
+    written = stages.get("serialize", {}).get("items", {}).get("bytes")
+    if written:
+        result["bytes_written"] = written
+    return result
+
+
+def run_benchmarks(sizes, engines, data_dir, repeat=1, seed=0, timeout=None, log=print):
+    """Run every engine over every size; returns a list of result dicts (fastest of repeat runs)."""
+    results = []
+    for size_name in sizes:
+        size = SIZES[size_name]
+        for engine in engines:
+            dataset, _, limit = ENGINES[engine]
+            entry = {"dataset": dataset, "size": size_name, "engine": engine}
+            if limit is not None and member_count(size) > limit:
+                results.append({**entry, "skipped": f"more than {limit} members"})
+                log(f"{dataset:5} {size_name:8} {engine:16} skipped (more than {limit} members)")
+                continue
+            input_path = dataset_path(data_dir, dataset, size, seed)
+            runs = [summarize(run_engine(engine, input_path, timeout)) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run["wall_s"])
+            results.append({**entry, **best})
+            log(f"{dataset:5} {size_name:8} {engine:16} {best['wall_s']:9.2f} s {best['members_per_s'] or 0:12.0f} members/s"
+                f" {(best['peak_rss'] or 0) / 2**20:8.1f} MiB")
+    return results
+
+
+def time_command(command, cwd=None, runs=STARTUP_RUNS):
+    """Fastest wall time of runs executions of command."""
+    env = {**os.environ, "PYTHONPATH": REPO_DIR}
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_startup(data_dir, seed=0, runs=STARTUP_RUNS):
+    """
+    Time the start-up checks; returns (check, seconds, overhead, budget, failed) rows, where
+    overhead is the time on top of a bare interpreter start.
+    """
+    pipeline = os.path.join(REPO_DIR, "ldes_pipeline.py")
+    input_path = os.path.abspath(dataset_path(data_dir, "sosa", SIZES["small"], seed))
+    work_dir = tempfile.mkdtemp(prefix="ldes-bench-")
+    try:
+        incremental = [sys.executable, pipeline, input_path, "--output", "OUT", "--incremental"]
+        # the completed run the no-op runs follow
+        subprocess.run(incremental, cwd=work_dir, check=True, stdout=subprocess.DEVNULL)
+        commands = {"interpreter": [sys.executable, "-c", "pass"],
+                    "help": [sys.executable, pipeline, "--help"],
+                    "no-op": incremental,
+                    "import-sosa": [sys.executable, "-c", "import RDF2LDES_V2"],
+                    "import-tss": [sys.executable, "-c", "import RDF2LDES_YMD_SPARQL_FOR_TSS_V3"]}
+        timings = {name: time_command(command, work_dir, runs) for name, command in commands.items()}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    rows = []
+    for name, seconds in timings.items():
+        overhead = seconds - timings["interpreter"]
+        budget = STARTUP_BUDGET.get(name)
+        rows.append((name, seconds, overhead, budget, budget is not None and overhead > budget))
+    return rows
+
+
+def print_startup(rows, log=print):
+    """Print the start-up checks; returns the number over budget."""
+    log(f"{'check':14} {'seconds':>9} {'overhead':>9} {'budget':>9}")
+    for name, seconds, overhead, budget, failed in rows:
+        log(f"{name:14} {seconds:9.3f} {overhead:9.3f} {'' if budget is None else f'{budget:9.3f}':>9}{'  FAIL' if failed else ''}")
+    failures = sum(1 for row in rows if row[4])
+    log(f"{failures} start-up checks over budget" if failures else "start-up within budget")
+    return failures
+
+
+def write_results(path, results, sizes, engines, seed=0, repeat=1):
+    """Write results with the workload that produced them, so --compare can rerun it."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"version": BENCH_VERSION,
+                   "created": datetime.now(timezone.utc).isoformat(),
+                   "python": platform.python_version(),
+                   "platform": platform.platform(),
+                   "cpus": os.cpu_count(),
+                   "workload": {"sizes": {name: SIZES[name] for name in sizes}, "engines": list(engines),
+                                "seed": seed, "repeat": repeat},
+                   "results": results}, file, indent=1)
+
+
+def compare_results(baseline, results, tolerance=0.25, memory_tolerance=0.20, min_seconds=0.25):
+    """
+    Compare results with the baseline results run by run. Returns (run, metric, baseline,
+    current, change, failed) rows; stages that took less than min_seconds in the baseline are
+    too noisy to compare and are left out.
+    """
+    current = {(result["dataset"], result["size"], result["engine"]): result for result in results}
+    rows = []
+    for base in baseline:
+        key = (base["dataset"], base["size"], base["engine"])
+        result = current.get(key)
+        if "skipped" in base or result is None or "skipped" in result:
+            continue
+        run = "/".join(key)
+        timings = [("wall_s", base["wall_s"], result["wall_s"])]
+        timings += [(f"{stage}_s", seconds, result["stages"][stage]) for stage, seconds in base["stages"].items()
+                    if stage in result["stages"]]
+        for metric, before, after in timings:
+            if before >= min_seconds:
+                change = after / before - 1
+                rows.append((run, metric, before, after, change, change > tolerance))
+        if base.get("members_per_s") and result.get("members_per_s"):
+            change = result["members_per_s"] / base["members_per_s"] - 1
+            rows.append((run, "members_per_s", base["members_per_s"], result["members_per_s"], change, change < -tolerance))
+        if base.get("peak_rss") and result.get("peak_rss"):
+            change = result["peak_rss"] / base["peak_rss"] - 1
+            rows.append((run, "peak_rss_mib", base["peak_rss"] / 2**20, result["peak_rss"] / 2**20, change,
+                         change > memory_tolerance))
+    return rows
+
+
+def print_comparison(rows, log=print):
+    """Print the comparison as a diff table; returns the number of failed checks."""
+    log(f"{'run':28} {'metric':16} {'baseline':>14} {'current':>14} {'change':>8}")
+    for run, metric, before, after, change, failed in rows:
+        log(f"{run:28} {metric:16} {before:14.4f} {after:14.4f} {change:+8.1%}{'  FAIL' if failed else ''}")
+    failures = sum(1 for row in rows if row[5])
+    log(f"{failures} of {len(rows)} checks over tolerance" if failures else f"all {len(rows)} checks within tolerance")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the RDF2LDES engines on synthetic SOSA and TSS data.")
+    parser.add_argument("--sizes", default="small,medium", help=f"comma separated, of {', '.join(SIZES)}")
+    parser.add_argument("--engines", default=",".join(ENGINES), help=f"comma separated, of {', '.join(ENGINES)}")
+    parser.add_argument("--days", type=int, help="custom size: days (the other custom options default to the small size)")
+    parser.add_argument("--sensors", type=int, help="custom size: sensors")
+    parser.add_argument("--properties", type=int, help="custom size: properties per sensor")
+    parser.add_argument("--readings", type=int, help="custom size: readings per sensor, property and day")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per engine and size, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, help="seconds before a run is aborted")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "ldes-bench-data"),
+                        help="where the generated sources are kept between runs")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--compare", metavar="BASELINE", help="rerun the workload of a results file and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="--compare: allowed slowdown of the total and of each stage (0.25: 25%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.20, help="--compare: allowed growth of the peak RSS")
+    parser.add_argument("--min-seconds", type=float, default=0.25, help="--compare: stages shorter than this in the baseline are not compared")
+    parser.add_argument("--startup", action="store_true", help="check the start-up of --help and no-op incremental runs against their budget")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return 0
+
+    if args.startup:
+        return 1 if print_startup(run_startup(args.data_dir, args.seed, max(args.repeat, STARTUP_RUNS))) else 0
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        workload = baseline["workload"]
+        SIZES.update(workload["sizes"])
+        results = run_benchmarks(list(workload["sizes"]), workload["engines"], args.data_dir, workload["repeat"],
+                                 workload["seed"], args.timeout)
+        if args.output:
+            write_results(args.output, results, workload["sizes"], workload["engines"], workload["seed"], workload["repeat"])
+        rows = compare_results(baseline["results"], results, args.tolerance, args.memory_tolerance, args.min_seconds)
+        return 1 if print_comparison(rows) else 0
+
+    sizes = args.sizes.split(",")
+    custom = {name: getattr(args, name) for name in SIZES["small"] if getattr(args, name) is not None}
+    if custom:
+        SIZES["custom"] = {**SIZES["small"], **custom}
+        sizes = ["custom"]
+    engines = args.engines.split(",")
+    unknown = [name for name in sizes if name not in SIZES] + [name for name in engines if name not in ENGINES]
+    if unknown:
+        parser.error(f"unknown size or engine: {', '.join(unknown)}")
+
+    results = run_benchmarks(sizes, engines, args.data_dir, args.repeat, args.seed, args.timeout)
+    if args.output:
+        write_results(args.output, results, sizes, engines, args.seed, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import numpy as np
+
+from ldes_table import NAIVE, datetime_to_ns
+
+# Vectorized time bucketing.
+# Bucket keys for all rows are computed in one NumPy pass, rows are ordered with one stable
+# sort on (key, time) and bucket boundaries are found by split-point search, so every bucket
+# is a contiguous, time-sorted slice of the sort order.
+
+NS_PER_SECOND = 1_000_000_000
+
+# fragmentation level -> numpy datetime64 unit
+UNITS = {"year": "Y", "month": "M", "day": "D", "hour": "h"}
+LEVELS = tuple(UNITS)
+
+
+def local_ns(times, offsets):
+    """Epoch nanoseconds shifted to the wall clock of their own UTC offset (naive rows stay as is)."""
+    shift = np.where(offsets == NAIVE, 0, offsets).astype(np.int64) * NS_PER_SECOND
+    return times + shift
+
+
+def bucket_keys(times, offsets, level="day"):
+    """Integer bucket key per row: whole years / months / days / hours since 1970."""
+    local = local_ns(times, offsets).astype("datetime64[ns]")
+    return local.astype(f"datetime64[{UNITS[level]}]").astype(np.int64)
+
+
+def key_to_parts(key, level="day"):
+    """Turn a bucket key back into its (year[, month[, day[, hour]]]) tuple."""
+    moment = np.datetime64(int(key), UNITS[level]).astype("datetime64[s]").item()
+    return (moment.year, moment.month, moment.day, moment.hour)[:list(UNITS).index(level) + 1]
+
+
+class Buckets:
+    """
+    Result of one bucketing pass.
+    order: row indices sorted by (bucket key, time); keys: one key per bucket;
+    bounds: bucket i covers order[bounds[i]:bounds[i + 1]];
+    times: epoch ns per row (unsorted), when the rows were bucketed by time.
+    """
+
+    def __init__(self, keys, order, bounds, level="day", times=None, levels=None):
+        self.keys = keys
+        self.order = order
+        self.bounds = bounds
+        self.level = level
+        self.times = times
+        self.levels = levels  # level per bucket when buckets are of mixed depth
+
+    def __len__(self):
+        return len(self.keys)
+
+    def slices(self):
+        """Yield (parts, slice) per bucket; the slice indexes the sorted order."""
+        for i, key in enumerate(self.keys.tolist()):
+            level = self.level if self.levels is None else self.levels[i]
+            yield key_to_parts(key, level), slice(int(self.bounds[i]), int(self.bounds[i + 1]))
+
+    def rows(self):
+        """Yield (parts, row_indices) per bucket."""
+        for parts, part in self.slices():
+            yield parts, self.order[part]
+
+    def time_range(self, part):
+        """(min, max) epoch ns of the bucket covering order[part]."""
+        rows = self.order[part]
+        return int(self.times[rows[0]]), int(self.times[rows[-1]])
+
+
+def group_rows(keys, times=None, level="day"):
+    """One stable sort plus split-point search; rows of a bucket are ordered by time."""
+    if times is None:
+        order = np.argsort(keys, kind="stable")
+    else:
+        order = np.lexsort((times, keys))
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.diff(sorted_keys)) + 1
+    bounds = np.concatenate(([0], starts, [len(order)])).astype(np.int64)
+    if len(order) == 0:
+        bounds = np.zeros(1, dtype=np.int64)
+    return Buckets(sorted_keys[bounds[:-1]], order, bounds, level, times)
+
+
+def datetime_columns(datetimes):
+    """Epoch ns and UTC offset arrays of a sequence of datetime objects."""
+    count = len(datetimes)
+    times = np.fromiter((datetime_to_ns(t) for t in datetimes), dtype=np.int64, count=count)
+    offsets = np.fromiter((NAIVE if t.utcoffset() is None else int(t.utcoffset().total_seconds())
+                           for t in datetimes), dtype=np.int32, count=count)
+    return times, offsets
+
+
+def bucket_datetimes(datetimes, level="day"):
+    """Bucket a sequence of datetime objects (for scripts that keep rows as Python objects)."""
+    times, offsets = datetime_columns(datetimes)
+    return group_rows(bucket_keys(times, offsets, level), times, level)
+
+
+#RDF2LDES##############################################################################################
+# Hierarchical partitioning.
+# levels is the path from the root down, e.g. ("year", "month") for monthly fragments or
+# ("year", "month", "day", "hour"). Rows are sorted once on the finest key; the keys of every
+# coarser level are then non-decreasing along that order, so each subtree is a contiguous range.
+# With a target band (low, high) the depth is chosen per subtree: a bucket is only split into the
+# next level when it holds more than high members and its children average at least low.
+
+
+def check_levels(levels):
+    levels = tuple(levels)
+    if not levels or levels != LEVELS[:len(levels)]:
+        raise ValueError(f"levels must run from the root down without gaps, e.g. {LEVELS[:3]}; got {levels}")
+    return levels
+
+
+def run_bounds(keys, start, stop):
+    """(start, stop) of every run of equal keys in keys[start:stop]."""
+    if stop <= start:
+        return []
+    cuts = [start] + (np.flatnonzero(np.diff(keys[start:stop])) + start + 1).tolist() + [stop]
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def partition_rows(times, offsets, levels=("year", "month", "day"), target=None):
+    """Bucket rows by the finest level, or per subtree by member density when target is given."""
+    levels = check_levels(levels)
+    local = local_ns(times, offsets).astype("datetime64[ns]")
+    level_keys = [local.astype(f"datetime64[{UNITS[level]}]").astype(np.int64) for level in levels]
+    order = np.lexsort((times, level_keys[-1]))
+    level_keys = [keys[order] for keys in level_keys]
+
+    if target is None:
+        runs = [(len(levels) - 1, start, stop) for start, stop in run_bounds(level_keys[-1], 0, len(order))]
+    else:
+        low, high = target
+        runs = []
+        stack = [(0, start, stop) for start, stop in reversed(run_bounds(level_keys[0], 0, len(order)))]
+        while stack:
+            depth, start, stop = stack.pop()
+            if depth + 1 < len(levels) and stop - start > high:
+                children = run_bounds(level_keys[depth + 1], start, stop)
+                if (stop - start) / len(children) >= low:
+                    stack.extend((depth + 1, a, b) for a, b in reversed(children))
+                    continue
+            runs.append((depth, start, stop))
+
+    if not runs:
+        return Buckets(np.empty(0, np.int64), order, np.zeros(1, np.int64), levels[-1], times, [])
+    keys = np.array([level_keys[depth][start] for depth, start, _ in runs], dtype=np.int64)
+    bounds = np.array([0] + [stop for _, _, stop in runs], dtype=np.int64)
+    return Buckets(keys, order, bounds, levels[-1], times, [levels[depth] for depth, _, _ in runs])
+
+
+def partition_table(table, levels=("year", "month", "day"), target=None):
+    """Partition the rows of an ObservationTable into (possibly mixed depth) buckets."""
+    return partition_rows(table.times, table.offsets, levels, target)
+
+
+def partition_datetimes(datetimes, levels=("year", "month", "day"), target=None):
+    """partition_table() for a sequence of datetime objects."""
+    return partition_rows(*datetime_columns(datetimes), levels, target)
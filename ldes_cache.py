@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+from rdflib.term import Identifier
+
+from ldes_table import ObservationTable, TermDictionary
+from ldes_parallel import encode_term, decode_term
+from ldes_spill import encode_subject, decode_subject
+
+# Snapshot cache of extracted records.
+# The first run over a source saves what extraction produced in <source>.ldes-cache/: every
+# numeric or dictionary coded column as a .npy file (loaded with mmap), the subject terms as a
+# UTF-8 buffer plus offsets (also mmapped), and the small dictionaries plus the source's size,
+# mtime and content hash in a JSON file. Later runs over the same source skip load_graph() and
+# the extraction altogether.
+
+CACHE_VERSION = 3
+CACHE_SUFFIX = ".ldes-cache"
+TABLE_COLUMNS = ("subjects", "ids", "results", "properties", "times", "offsets", "lexical")
+RACY_NS = 2 * 10**9 #a source modified this close to (or after) the snapshot is hashed even when size and mtime match
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        while chunk := file.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def encode_value(value):
+    """encode_term() for rdflib terms; plain Python values (e.g. a property read as a string) are tagged."""
+    return encode_term(value) if isinstance(value, Identifier) else {"value": value}
+
+
+def decode_value(value):
+    return value["value"] if isinstance(value, dict) else decode_term(value)
+
+
+class MappedTerms:
+    """Read-only sequence of subject terms over a memory-mapped UTF-8 buffer; a term is decoded when it is read."""
+
+    def __init__(self, text, offsets):
+        self.text = text
+        self.offsets = offsets
+
+    @staticmethod
+    def columns(terms):
+        """(text, offsets) arrays for a list of subject terms."""
+        encoded = [encode_subject(term).encode() for term in terms]
+        offsets = np.zeros(len(encoded) + 1, np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), np.uint8), offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code):
+        start, end = self.offsets[code:code + 2].tolist()
+        return decode_subject(self.text[start:end].tobytes().decode())
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+
+class SnapshotCache:
+    """One kind of snapshot ("observations", "snippets") of one source file."""
+
+    def __init__(self, source_path, kind):
+        self.source_path = source_path
+        self.kind = kind
+        self.directory = source_path + CACHE_SUFFIX
+        self.meta_path = os.path.join(self.directory, f"{kind}.json")
+
+    def source_key(self):
+        stat = os.stat(self.source_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def column_path(self, name):
+        return os.path.join(self.directory, f"{self.kind}.{name}.npy")
+
+    def lookup(self):
+        """
+        Metadata of a snapshot that matches the source, or None. Matching size and mtime are
+        trusted without reading the source, unless the source was modified within RACY_NS of the
+        snapshot being taken (an edit in the same mtime tick would go unnoticed). When only the size
+        matches (the file was touched or copied) the content hash decides. An edit that keeps the
+        size and sets the mtime back (touch -d, some copy tools) is not detected.
+        """
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != CACHE_VERSION:
+            return None
+        size, mtime = self.source_key()
+        if meta["size"] != size:
+            return None
+        if meta["mtime_ns"] != mtime or mtime >= meta["stored_ns"] - RACY_NS:
+            if meta["hash"] != file_digest(self.source_path):
+                return None
+            meta.update(mtime_ns=mtime, stored_ns=time.time_ns())
+            self.write_meta(meta)
+        return meta
+
+    def write_meta(self, meta):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, self.meta_path)
+
+    def store(self, columns, meta):
+        """Save the columns, then the metadata; a snapshot without metadata is never used."""
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        for name, column in columns.items():
+            np.save(self.column_path(name), column)
+        size, mtime = self.source_key()
+        meta.update(version=CACHE_VERSION, size=size, mtime_ns=mtime, stored_ns=time.time_ns(),
+                    hash=file_digest(self.source_path))
+        self.write_meta(meta)
+
+    def load_table(self):
+        """The cached ObservationTable with memory-mapped columns, or None on a miss."""
+        meta = self.lookup()
+        if meta is None:
+            return None
+        columns = {name: np.load(self.column_path(name), mmap_mode="r")
+                   for name in TABLE_COLUMNS + ("subject_text", "subject_offsets")}
+        return ObservationTable(columns["subjects"], columns["ids"], columns["results"], columns["properties"],
+                                columns["times"], columns["offsets"],
+                                MappedTerms(columns["subject_text"], columns["subject_offsets"]),
+                                [decode_value(term) for term in meta["property_terms"]],
+                                columns["lexical"], [tuple(pair) for pair in meta["lexical_terms"]])
+
+    def save_table(self, table):
+        columns = {name: getattr(table, name) for name in TABLE_COLUMNS}
+        columns["subject_text"], columns["subject_offsets"] = MappedTerms.columns(table.subject_terms)
+        self.store(columns,
+                   {"property_terms": [encode_value(term) for term in table.property_terms],
+                    "lexical_terms": table.lexical_terms})
+
+    def load_rows(self):
+        """The cached result rows (dicts of rdflib terms), or None on a miss."""
+        meta = self.lookup()
+        if meta is None:
+            return None
+        fields = meta["fields"]
+        terms = {field: [decode_value(term) for term in meta["terms"][field]] for field in fields}
+        codes = [np.load(self.column_path(field), mmap_mode="r") for field in fields]
+        return [dict(zip(fields, (terms[field][code] for field, code in zip(fields, row))))
+                for row in zip(*(column.tolist() for column in codes))]
+
+    def save_rows(self, rows, fields):
+        """Save result rows field by field, each field dictionary coded."""
+        dictionaries = {field: TermDictionary() for field in fields}
+        columns = {field: np.fromiter((dictionaries[field].encode(row[field]) for row in rows),
+                                      dtype=np.int32, count=len(rows))
+                   for field in fields}
+        self.store(columns, {"fields": list(fields),
+                             "terms": {field: [encode_value(term) for term in dictionaries[field].values]
+                                       for field in fields}})
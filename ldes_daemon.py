@@ -0,0 +1,215 @@
+import json
+import os
+import shlex
+import socket
+import socketserver
+import sys
+
+from ldes_inputs import expand_inputs
+from ldes_pipeline import add_arguments, from_arguments
+
+# Warm daemon.
+# "serve" parses and extracts the sources of a pipeline once (the slow part of every run) and keeps
+# the extracted members and the bucket index in memory; the rdflib Graph is dropped after extraction.
+# Commands come in over a local UNIX socket, one line per connection, and get one line of JSON back:
+#   status              members and fragments held, sources and base URI
+#   rebuild             reload the shape's script, so edits to create_ldes_files() and the other tree
+#                       code take effect, and write the whole tree again; fragments are left alone
+#   append FILE...      parse more source files (paths or globs) and add their members; only the
+#                       fragments they change and the tree nodes above them are rewritten
+#   emit BASE_URI       write every fragment and tree node again under a new base URI (the event
+#                       stream and home page follow it)
+#   stop                shut the daemon down
+# Fragments are written like an incremental run (the state is kept in the output directory), so a
+# command only touches files whose content changed. Commands run one at a time, in arrival order.
+#
+#   python ldes_daemon.py serve sources/*.ttl --shape sosa --output LDES &
+#   python ldes_daemon.py send append sources/2021-01.ttl
+#   python ldes_daemon.py send emit https://example.org/mirror/
+
+DAEMON_SOCKET = "ldes.sock"
+COMMANDS = ("status", "rebuild", "append", "emit", "stop")
+UNSUPPORTED = ("out_of_core", "max_memory", "append_only", "profile_dir")  # members on disk, a journal or main() only
+
+
+class WarmState:
+    """The members and bucket index of a pipeline's sources, kept in memory between commands."""
+
+    def __init__(self, pipeline, inputs, output):
+        unsupported = [name for name in UNSUPPORTED if pipeline.options.get(name)]
+        if unsupported:
+            raise ValueError(f"The daemon keeps every member in memory and does not support {', '.join(unsupported)}")
+        self.pipeline = pipeline
+        self.inputs = expand_inputs(inputs)
+        self.output = output
+        self.script = pipeline.configure(self.inputs, output)
+        self.members = None
+        self.index = None
+
+    def read(self, paths):
+        """Members of some source files: an ObservationTable (sosa) or a list of snippet rows (tss)."""
+        script = self.script
+        with script.metrics.stage("ingest"):
+            members = script.ingest(paths)[0] if self.pipeline.shape == "sosa" else script.ingest(paths)
+        script.metrics.count("ingest", members=len(members))
+        return members
+
+    def write(self):
+        """Write the fragments whose members changed since the last command and the tree nodes above them."""
+        state = self.script.open_state()
+        self.index = self.script.divide_data(self.members, state)
+        self.script.build_tree(self.index, state)
+
+    def load(self):
+        self.script.metrics.start({"command": "load", "input_path": self.inputs, "base_path": self.output})
+        self.members = self.read(self.inputs)
+        self.write()
+
+    def append(self, paths):
+        paths = expand_inputs(paths)
+        added = self.read(paths)
+        if self.pipeline.shape == "sosa":
+            from ldes_table import ObservationTable
+
+            self.members = ObservationTable.concatenate([self.members, added])
+        else:
+            self.members = self.members + added
+        self.inputs += [path for path in paths if path not in self.inputs]
+        self.write()
+
+    def emit(self, base_uri):
+        self.pipeline.base_uri = base_uri
+        self.pipeline.eventstream_uri = self.pipeline.home_page = None
+        # the output settings are part of the incremental state, so every fragment is rewritten
+        self.script = self.pipeline.configure(self.inputs, self.output)
+        self.write()
+
+    def reload(self):
+        """Execute the shape's script again (its config globals are set again, the members are kept)."""
+        self.pipeline.reload()
+        self.script = self.pipeline.configure(self.inputs, self.output)
+
+    def status(self):
+        return {"members": len(self.members), "fragments": sum(1 for _ in self.index.leaves()),
+                "inputs": self.inputs, "base_uri": self.pipeline.base_uri}
+
+    def command(self, line):
+        """Run one command line (except stop); returns the reply."""
+        words = shlex.split(line)
+        if not words or words[0] not in COMMANDS:
+            raise ValueError(f"Unknown command {line!r}, expected one of {', '.join(COMMANDS)}")
+        name, args = words[0], words[1:]
+        if name == "rebuild":
+            self.reload()
+        metrics = self.script.metrics
+        metrics.start({"command": line, "input_path": self.inputs, "base_path": self.output})
+        if name == "rebuild":
+            self.script.build_tree(self.index)
+        elif name == "append":
+            if not args:
+                raise ValueError("append needs one or more source files")
+            self.append(args)
+        elif name == "emit":
+            if len(args) != 1:
+                raise ValueError("emit needs the new base URI")
+            self.emit(args[0])
+        report = metrics.to_json()
+        reply = {"ok": True, "command": name, **self.status(), "wall_s": report["wall_s"],
+                 "stages": {stage: values["wall_s"] for stage, values in report["stages"].items()}}
+        if self.script.timing_report:
+            reply["report"] = metrics.report(self.script.timing_report)
+        return reply
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline().decode("utf-8").strip()
+        if not line:  # a listening() probe, or a client that went away
+            return
+        try:
+            if line == "stop":
+                self.server.stopping = True
+                reply = {"ok": True, "command": "stop"}
+            else:
+                reply = self.server.warm.command(line)
+        except Exception as error:  # the client gets the error, the daemon keeps its state and serves on
+            reply = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+        self.wfile.write((json.dumps(reply, default=str) + "\n").encode("utf-8"))
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    def __init__(self, path, warm):
+        super().__init__(path, CommandHandler)
+        self.warm = warm
+        self.stopping = False
+
+
+def listening(path):
+    """Whether a daemon answers on the socket at path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+            return True
+        except OSError:
+            return False
+
+
+def serve(warm, path=DAEMON_SOCKET):
+    """Answer commands on the UNIX socket at path until a stop command."""
+    if os.path.exists(path):
+        if listening(path):
+            raise RuntimeError(f"A daemon is already listening on {path}")
+        os.remove(path)  # left behind by a daemon that was killed
+    server = DaemonServer(path, warm)
+    try:
+        print(f"Serving {len(warm.members)} members of {len(warm.inputs)} source file(s) on {path}", flush=True)
+        while not server.stopping:
+            server.handle_request()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def send(line, path=DAEMON_SOCKET):
+    """Send one command line to the daemon at path; returns its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall((line + "\n").encode("utf-8"))
+        with client.makefile("r", encoding="utf-8") as reply:
+            return json.loads(reply.readline())
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Keep the members of an LDES pipeline in memory and serve commands.")
+    actions = parser.add_subparsers(dest="action", required=True)
+    serve_parser = actions.add_parser("serve", help="load the sources, write the LDES and wait for commands")
+    add_arguments(serve_parser)
+    serve_parser.add_argument("--socket", default=DAEMON_SOCKET, help="UNIX socket path")
+    send_parser = actions.add_parser("send", help="send a command to a running daemon")
+    send_parser.add_argument("command", nargs="+", help=", ".join(COMMANDS))
+    send_parser.add_argument("--socket", default=DAEMON_SOCKET, help="UNIX socket path")
+    args = vars(parser.parse_args(argv))
+    action, path = args.pop("action"), args.pop("socket")
+
+    if action == "send":
+        words = args["command"]
+        if words[0] == "append":
+            # the daemon may run in another directory
+            words = words[:1] + [os.path.abspath(word) for word in words[1:]]
+        reply = send(shlex.join(words), path)
+        print(json.dumps(reply, indent=1))
+        return 0 if reply.get("ok") else 1
+
+    try:
+        warm = WarmState(*from_arguments(serve_parser, args))
+    except ValueError as error:  # an engine, writer or option the shape (or the daemon) does not support
+        serve_parser.error(str(error))
+    warm.load()
+    serve(warm, path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
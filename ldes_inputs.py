@@ -0,0 +1,38 @@
+import glob
+import os
+import re
+
+# Source files.
+# Only the standard library is imported here, so entry points can list the sources (and decide
+# that nothing changed since the last run) before rdflib and NumPy are loaded.
+
+SOURCE_FILE = re.compile(r"\.(ttl|nt)(\.(gz|bz2|xz|zst))?$", re.IGNORECASE)
+
+
+def expand_inputs(input_path):
+    """
+    Source files named by input_path: a file, a directory (its .ttl / .nt files, compressed or not),
+    a glob pattern, or a list of those. Sorted, without duplicates.
+    """
+    patterns = [input_path] if isinstance(input_path, (str, os.PathLike)) else list(input_path)
+    files = []
+    for pattern in map(os.fspath, patterns):
+        if os.path.isdir(pattern):
+            files.extend(os.path.join(pattern, name) for name in os.listdir(pattern) if SOURCE_FILE.search(name))
+        elif glob.has_magic(pattern):
+            files.extend(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        else:
+            files.append(pattern)
+    return sorted(set(files))
+
+
+def source_stamps(paths):
+    """{path: [size, mtime_ns]} of the source files; a missing file has no stamp (None)."""
+    stamps = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamps[path] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            stamps[path] = None
+    return stamps
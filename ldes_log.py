@@ -0,0 +1,78 @@
+import json
+import os
+import time
+
+# Run log (logs.txt).
+# One RunLog per run keeps logs.txt open with a large write buffer instead of opening and
+# closing it for every message. Messages take %-style arguments that are only formatted when
+# the message's level is enabled, so a quiet run (or a level above debug) pays one comparison
+# per call. The text format writes messages exactly as given (they carry their own newlines);
+# the jsonl format writes one {"time", "level", "message"} object per message.
+
+LOG_FILE = "logs.txt"
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "quiet": 100}
+LOG_FORMATS = ("text", "jsonl")
+LOG_BUFFER = 1 << 16
+
+
+class RunLog:
+    """Buffered, levelled run log; nothing is written (and no file created) below the level."""
+
+    def __init__(self, path=LOG_FILE, level="debug", format="text"):
+        self.path = path
+        self.file = None
+        self.configure(level, format)
+
+    def configure(self, level="debug", format="text"):
+        if level not in LOG_LEVELS:
+            raise ValueError(f"Unknown log level {level!r}, expected one of {', '.join(LOG_LEVELS)}")
+        if format not in LOG_FORMATS:
+            raise ValueError(f"Unknown log format {format!r}, expected one of {', '.join(LOG_FORMATS)}")
+        self.threshold = LOG_LEVELS[level]
+        self.format = format
+
+    def start(self, level="debug", format="text"):
+        """Begin a run: the previous run's log is removed, the file is created with the first message."""
+        self.close()
+        self.configure(level, format)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def enabled(self, level):
+        return LOG_LEVELS[level] >= self.threshold
+
+    def log(self, level, msg, *args):
+        if LOG_LEVELS[level] < self.threshold:
+            return
+        if args:
+            msg = msg % args
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8", buffering=LOG_BUFFER)
+        if self.format == "text":
+            self.file.write(msg)
+        elif msg.strip("- \n"):  # separator lines carry nothing in JSON
+            self.file.write(json.dumps({"time": time.time(), "level": level, "message": msg.strip()}) + "\n")
+
+    def debug(self, msg, *args):
+        self.log("debug", msg, *args)
+
+    def info(self, msg, *args):
+        self.log("info", msg, *args)
+
+    def warning(self, msg, *args):
+        self.log("warning", msg, *args)
+
+    def error(self, msg, *args):
+        self.log("error", msg, *args)
+
+    def close(self):
+        """Flush and close the file; the next message reopens it for appending."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
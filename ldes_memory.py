@@ -0,0 +1,65 @@
+import os
+import re
+
+try:
+    import psutil
+except ImportError:  # optional: /proc or tracemalloc are used instead
+    psutil = None
+
+# Memory budget (--max-memory).
+# The scripts check the resident set size at the points where memory grows: while extracted
+# rows are collected (they are spilled to run files once the budget is nearly used up) and
+# before an rdflib Dataset is built for a bucket (too big a bucket is streamed by the template
+# writer instead). Checks are cheap, so they run once per chunk / bucket.
+
+SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+HEADROOM = 0.25  # part of the budget kept free for the write stage and the tree
+DATASET_ROW_BYTES = 10_000  # measured cost of one observation / snippet in an rdflib Dataset (~9 KB)
+
+
+def parse_size(text):
+    """"4G", "512M", "1.5GB" or a plain byte count -> bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid memory size {text!r}, expected e.g. 512M or 8G")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None when the platform does not tell."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    import tracemalloc  # only this fallback needs it
+
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return None
+
+
+class MemoryBudget:
+    """Byte budget for one run, checked against the process RSS."""
+
+    def __init__(self, limit, headroom=HEADROOM):
+        self.limit = limit
+        self.soft_limit = int(limit * (1 - headroom))
+        if current_rss() is None:
+            # no RSS source (no psutil, no /proc): count Python allocations instead
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def used(self):
+        return current_rss() or 0
+
+    def exceeded(self, extra=0):
+        """True when the current usage plus extra bytes would pass the soft limit."""
+        return self.used() + extra > self.soft_limit
+
+    def fits_dataset(self, rows):
+        """Whether an rdflib Dataset of rows members can be built within the budget."""
+        return not self.exceeded(rows * DATASET_ROW_BYTES)
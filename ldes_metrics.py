@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows: the report has no peak RSS or child CPU time
+    resource = None
+
+from ldes_memory import current_rss
+
+# Per-stage instrumentation.
+# main() wraps every stage (parse, extract, group, serialize, filesystem, tree) in
+# metrics.stage(); a stage may be entered many times (once per bucket) and its wall time,
+# CPU time, RSS and item counts (triples, members, bytes) add up. report() writes one
+# JSON file per run with those totals and the derived items/second.
+# A stage's peak_rss is the process's high-water mark (ru_maxrss) when the stage raised it, so it
+# is None for a stage that never used more memory than an earlier one; exit_rss is the largest
+# RSS seen when the stage was left (what it kept, not what it used while running).
+
+REPORT_VERSION = 2
+
+
+def children_cpu():
+    """CPU seconds of finished child processes (worker pools)."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # kilobytes on Linux
+
+
+class StageMetrics:
+    """Totals of one stage over all the times it was entered."""
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.child_cpu = 0.0
+        self.peak_rss = None
+        self.exit_rss = None
+        self.items = {}
+
+    def to_json(self):
+        stage = {"calls": self.calls, "wall_s": round(self.wall, 6), "cpu_s": round(self.cpu, 6),
+                 "child_cpu_s": round(self.child_cpu, 6), "peak_rss": self.peak_rss, "exit_rss": self.exit_rss,
+                 "items": dict(self.items)}
+        stage["per_second"] = {name: round(count / self.wall, 1) if self.wall else None
+                               for name, count in self.items.items()}
+        return stage
+
+
+class RunMetrics:
+    """Stage timings and counters of one run."""
+
+    def __init__(self):
+        self.start()
+
+    def start(self, settings=None, profiler=None):
+        """
+        Forget earlier runs; settings (e.g. input and output options) are copied into the report.
+        A StageProfiler (ldes_profile) is told about every stage entered and left.
+        """
+        self.stages = {}
+        self.settings = dict(settings or {})
+        self.profiler = profiler
+        self.started = datetime.now(timezone.utc)
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.child_cpu_start = children_cpu()
+
+    def get(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageMetrics()
+        return stage
+
+    @contextmanager
+    def stage(self, name, **items):
+        """Time a block as part of stage name; items are counts to add, more can be added with count()."""
+        stage = self.get(name)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.enter(name)
+        wall, cpu, child_cpu, peak = time.perf_counter(), time.process_time(), children_cpu(), peak_rss()
+        try:
+            yield stage
+        finally:
+            stage.calls += 1
+            stage.wall += time.perf_counter() - wall
+            stage.cpu += time.process_time() - cpu
+            stage.child_cpu += children_cpu() - child_cpu
+            if profiler is not None:
+                profiler.exit(name)
+            rss, new_peak = current_rss(), peak_rss()
+            if rss is not None and (stage.exit_rss is None or rss > stage.exit_rss):
+                stage.exit_rss = rss
+            if new_peak is not None and new_peak > peak and (stage.peak_rss is None or new_peak > stage.peak_rss):
+                stage.peak_rss = new_peak
+            self.count(name, **items)
+
+    def count(self, name, **items):
+        """Add item counts, e.g. count("serialize", members=10, bytes=4096)."""
+        stage_items = self.get(name).items
+        for item, number in items.items():
+            stage_items[item] = stage_items.get(item, 0) + int(number)
+
+    def to_json(self):
+        return {"version": REPORT_VERSION,
+                "started": self.started.isoformat(),
+                "settings": self.settings,
+                "wall_s": round(time.perf_counter() - self.wall_start, 6),
+                "cpu_s": round(time.process_time() - self.cpu_start, 6),
+                "child_cpu_s": round(children_cpu() - self.child_cpu_start, 6),
+                "peak_rss": peak_rss(),
+                "stages": {name: stage.to_json() for name, stage in self.stages.items()}}
+
+    def report(self, path):
+        """
+        Write the report as JSON to path; "{start}" in path is replaced by the start time, so
+        e.g. "./reports/run-{start}.json" keeps one file per run. Returns the file name.
+        """
+        path = path.format(start=self.started.strftime("%Y%m%dT%H%M%S"))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.to_json(), file, indent=1, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+from rdflib import BNode, Literal, URIRef
+
+from ldes_table import ObservationTable
+from ldes_writer import write_observation_table, write_snippet_fragment
+
+# Parallel fragment writing.
+# Day buckets are written by a process pool, largest first (LPT scheduling) so one busy day
+# does not end up running alone at the end. Workers receive plain strings and NumPy arrays,
+# never pickled rdflib terms, and only a bounded number of payloads is in flight at once.
+
+
+def encode_term(term):
+    """rdflib term -> picklable plain value (str IRI, ("_", id) blank node, (lex, dt, lang) literal)."""
+    if isinstance(term, BNode):
+        return ("_", str(term))
+    if isinstance(term, Literal):
+        return (str(term), str(term.datatype) if term.datatype else None, term.language)
+    return str(term)
+
+
+def decode_term(value):
+    if isinstance(value, str):
+        return URIRef(value)
+    if len(value) == 2:
+        return BNode(value[1])
+    lexical, datatype, lang = value
+    return Literal(lexical, lang=lang, datatype=URIRef(datatype) if datatype else None)
+
+
+def observation_payload(table, rows):
+    """Compact, picklable copy of some table rows."""
+    part = table.take(rows)
+    subjects = [encode_term(table.subject_terms[code]) for code in part.subjects.tolist()]
+    property_codes, properties = np.unique(part.properties, return_inverse=True)
+    property_terms = [table.property_terms[code] for code in property_codes.tolist()]
+    return (subjects, part.ids, part.results, properties.astype(np.int32), part.times, part.offsets, property_terms,
+            part.lexical, table.lexical_terms)
+
+
+def write_observation_payload(file_path, payload, eventstream_uri, home_page, format="trig"):
+    subjects, ids, results, properties, times, offsets, property_terms, lexical, lexical_terms = payload
+    table = ObservationTable(np.arange(len(subjects), dtype=np.int32), ids, results, properties, times,
+                             offsets, [decode_term(s) for s in subjects], property_terms, lexical, lexical_terms)
+    write_observation_table(file_path, table, slice(None), URIRef(eventstream_uri), URIRef(home_page), format)
+    return file_path
+
+
+SNIPPET_FIELDS = ("snippet", "template", "sensor", "observedProperty", "fromTime", "toTime", "pointType", "pointsJson")
+
+
+def snippet_payload(rows):
+    return [tuple(encode_term(row[field]) for field in SNIPPET_FIELDS) for row in rows]
+
+
+def write_snippet_payload(file_path, payload, eventstream_uri, home_page, format="trig"):
+    rows = [dict(zip(SNIPPET_FIELDS, map(decode_term, row))) for row in payload]
+    write_snippet_fragment(file_path, rows, URIRef(eventstream_uri), URIRef(home_page), format)
+    return file_path
+
+
+def run_largest_first(jobs, workers=None, max_pending=None):
+    """
+    jobs: list of (size, make_payload, worker_fn, args). Jobs are submitted in decreasing size;
+    payloads are built lazily so at most max_pending of them exist at the same time.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    jobs = sorted(jobs, key=lambda job: job[0], reverse=True)
+    # multiprocessing is only loaded by runs that use a pool
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    done_paths = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for size, make_payload, worker_fn, args in jobs:
+            if len(pending) >= max_pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                done_paths.extend(f.result() for f in finished)
+            file_path, *rest = args
+            pending.add(pool.submit(worker_fn, file_path, make_payload(), *rest))
+        done_paths.extend(f.result() for f in wait(pending).done)
+    return done_paths
+
+
+def write_observation_buckets(table, jobs, eventstream_uri, home_page, format="trig", workers=None):
+    """jobs: list of (file_path, rows) where rows index the table."""
+    return run_largest_first([
+        (len(table.times[rows]) if isinstance(rows, slice) else len(rows),
+         lambda rows=rows: observation_payload(table, rows),
+         write_observation_payload,
+         (file_path, str(eventstream_uri), str(home_page), format))
+        for file_path, rows in jobs
+    ], workers)
+
+
+def write_snippet_buckets(jobs, eventstream_uri, home_page, format="trig", workers=None):
+    """jobs: list of (file_path, rows) with rows as SPARQL result rows."""
+    return run_largest_first([
+        (len(rows), lambda rows=rows: snippet_payload(rows), write_snippet_payload,
+         (file_path, str(eventstream_uri), str(home_page), format))
+        for file_path, rows in jobs
+    ], workers)
+
+
+#RDF2LDES##############################################################################################
+# Parallel ingestion.
+# input_path may name many source files (e.g. one per hour). Each file is parsed and extracted
+# in its own worker process; workers send back compact results (table columns, encoded terms)
+# which are merged in the parent before bucketing, so parsing uses every core.
+
+
+def iter_files(paths, worker_fn, args=(), workers=None):
+    """
+    Yield (index, worker_fn(path, *args)) for every path as workers finish, largest file first.
+    At most two results per worker are pending, so results can be consumed (e.g. spilled) as they come.
+    """
+    workers = workers or os.cpu_count() or 1
+    by_size = sorted(range(len(paths)), key=lambda i: os.path.getsize(paths[i]), reverse=True)
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, as_completed
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        for i in by_size:
+            if len(pending) >= 2 * workers:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield pending.pop(future), future.result()
+            pending[pool.submit(worker_fn, paths[i], *args)] = i
+        for future in as_completed(pending):
+            yield pending[future], future.result()
+
+
+def map_files(paths, worker_fn, args=(), workers=None):
+    """worker_fn(path, *args) for every path in a process pool; results in path order."""
+    results = [None] * len(paths)
+    for i, result in iter_files(paths, worker_fn, args, workers):
+        results[i] = result
+    return results
+
+
+def table_payload(table):
+    """Picklable copy of a whole ObservationTable (subjects as plain strings, not rdflib terms)."""
+    return (table.subjects, table.ids, table.results, table.properties, table.times, table.offsets,
+            [encode_term(term) for term in table.subject_terms], table.property_terms, table.lexical, table.lexical_terms)
+
+
+def payload_table(payload):
+    *columns, subject_terms, property_terms, lexical, lexical_terms = payload
+    return ObservationTable(*columns, [decode_term(term) for term in subject_terms], property_terms, lexical, lexical_terms)
+
+
+def read_table_payload(path, read_table, args):
+    return table_payload(read_table(path, *args))
+
+
+def read_tables(paths, read_table, args=(), workers=None):
+    """One ObservationTable from read_table(path, *args) run for every path in worker processes."""
+    payloads = map_files(paths, read_table_payload, (read_table, args), workers)
+    return ObservationTable.concatenate([payload_table(payload) for payload in payloads])
+
+
+def iter_tables(paths, read_table, args=(), workers=None):
+    """The tables of read_table(path, *args) in completion order, for consumers that never hold them all."""
+    for _, payload in iter_files(paths, read_table_payload, (read_table, args), workers):
+        yield payload_table(payload)
+
+
+def read_rows_payload(path, read_rows, args):
+    return snippet_payload(read_rows(path, *args))
+
+
+def read_snippet_rows(paths, read_rows, args=(), workers=None):
+    """The snippet rows of read_rows(path, *args) run for every path in worker processes, in path order."""
+    rows = []
+    for payload in map_files(paths, read_rows_payload, (read_rows, args), workers):
+        rows.extend(dict(zip(SNIPPET_FIELDS, map(decode_term, row))) for row in payload)
+    return rows
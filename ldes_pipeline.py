@@ -0,0 +1,226 @@
+import importlib
+import json
+import os
+
+from ldes_inputs import expand_inputs, source_stamps
+from ldes_log import LOG_FORMATS, LOG_LEVELS
+from ldes_memory import parse_size
+
+# One entry point for both member shapes.
+# A Pipeline is a choice of three strategies plus options:
+#   shape   what a member is: "sosa" (sosa:Observation, RDF2LDES_V2) or "tss" (tss:Snippet,
+#           RDF2LDES_YMD_SPARQL_FOR_TSS_V3)
+#   engine  how members are extracted: "direct" (rdflib Graph walked through its indexes),
+#           "stream" (SOSA: tokenizer, no Graph) or "sparql" (TSS: the original SELECT join)
+#   writer  how fragments are written: "rdflib" (a Dataset serialized per bucket) or "fast"
+#           (TriG / N-Quads templates)
+# "auto" picks the fastest engine / writer of the shape as measured by ldes_bench. The shape's
+# script does the work: run() sets its config globals from the pipeline and calls its main(),
+# so the scripts keep working on their own and no code is forked.
+# Nothing here imports rdflib or NumPy: the shape's script (and with it the rdflib plugin
+# registry) is only loaded when a run has work to do. An incremental or append-only run whose
+# sources and settings are those of the last completed run ends after a few stat() calls.
+#
+#   python ldes_pipeline.py sources/*.ttl --shape tss --engine direct --writer fast --output LDESTSS
+#   python ldes_pipeline.py --config mol_sluis.json
+
+BASE_URI = "https://shehabeldeenayman.github.io/Mol_sluis_Dessel_Usecase/"
+
+SHAPES = {"sosa": "RDF2LDES_V2", "tss": "RDF2LDES_YMD_SPARQL_FOR_TSS_V3"}
+ENGINES = {
+    "sosa": {"direct": {"stream_input": False}, "stream": {"stream_input": True}},
+    "tss": {"sparql": {"direct_extract": False}, "direct": {"direct_extract": True}},
+}
+WRITERS = {"rdflib": {"fast_writer": False}, "fast": {"fast_writer": True}}
+AUTO = {"sosa": ("stream", "fast"), "tss": ("direct", "fast")}  # fastest in ldes_bench
+
+URI_SETTINGS = ("base_uri", "eventstream_uri", "home_page")  # set on the script as URIRef
+RUN_FILE = ".ldes_run.json"  # settings and source stamps of the last completed incremental run, in the output directory
+
+# script config globals a pipeline passes through unchanged (None: the script's default)
+OPTIONS = ("output_format", "workers", "ingest_workers", "tree_from_index", "incremental", "append_only",
+           "max_members", "levels", "target_members", "snapshot_cache", "out_of_core", "spill_budget",
+           "spill_dir", "max_memory", "timing_report", "profile_dir", "profile_memory", "log_level", "log_format")
+DEFAULTS = {}  # script module name: its OPTIONS values as the script sets them, taken before the first run changes them
+
+
+def output_path(output):
+    """
+    The output directory as base_path and the node URIs use it: normalised, with forward slashes,
+    relative to the site root. An absolute path, or one outside the current directory, is refused.
+    """
+    path = os.path.normpath(output)
+    if os.path.isabs(path) or path.split(os.sep)[0] in (os.curdir, os.pardir):
+        raise ValueError(f"The output must be a directory below the current one (the site root), got {output!r}")
+    return path.replace(os.sep, "/")
+
+
+class Pipeline:
+    """Shape, engine and writer strategies plus options; run() fragments a source into an LDES."""
+
+    def __init__(self, shape="sosa", engine="auto", writer="auto", base_uri=BASE_URI, eventstream_uri=None,
+                 home_page=None, **options):
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown shape {shape!r}, expected one of {', '.join(SHAPES)}")
+        engine = AUTO[shape][0] if engine == "auto" else engine
+        writer = AUTO[shape][1] if writer == "auto" else writer
+        if engine not in ENGINES[shape]:
+            raise ValueError(f"Engine {engine!r} does not extract {shape} members, expected one of {', '.join(ENGINES[shape])}")
+        if writer not in WRITERS:
+            raise ValueError(f"Unknown writer {writer!r}, expected one of {', '.join(WRITERS)}")
+        unknown = set(options) - set(OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown pipeline options: {', '.join(sorted(unknown))}")
+        self.shape = shape
+        self.engine = engine
+        self.writer = writer
+        self.base_uri = base_uri
+        self.eventstream_uri = eventstream_uri
+        self.home_page = home_page
+        self.options = {name: value for name, value in options.items() if value is not None}
+
+    def script(self):
+        return importlib.import_module(SHAPES[self.shape])
+
+    def settings(self, inputs, output):
+        """
+        The script globals for one run. output is the LDES directory relative to the site root
+        (it is part of every node URI); the event stream and home page default to the
+        <output>/<output>#eventstream and <output>/<output>.trig names the scripts use.
+        URIs are plain strings here.
+        """
+        output = output_path(output)
+        name = os.path.basename(output)
+        settings = {"input_path": inputs, "base_path": output, "directory": f"{output}/",
+                    "base_uri": self.base_uri,
+                    "eventstream_uri": self.eventstream_uri or f"{self.base_uri}{output}/{name}#eventstream",
+                    "home_page": self.home_page or f"{self.base_uri}{output}/{name}.trig"}
+        settings.update(ENGINES[self.shape][self.engine])
+        settings.update(WRITERS[self.writer])
+        settings.update(self.options)
+        return settings
+
+    def reload(self):
+        """Execute the shape's script again (e.g. after an edit); its defaults are taken again."""
+        script = importlib.reload(self.script())
+        DEFAULTS.pop(script.__name__, None)
+        return script
+
+    def configure(self, inputs, output):
+        """
+        Import the shape's script and set its config globals for a run; returns the script module.
+        Options this pipeline leaves at None get the script's default again, not the value an
+        earlier run in the same process set.
+        """
+        script = self.script()
+        from rdflib import URIRef  # already loaded by the script
+
+        defaults = DEFAULTS.setdefault(script.__name__, {name: getattr(script, name) for name in OPTIONS if hasattr(script, name)})
+        for name, value in defaults.items():
+            setattr(script, name, value)
+        for name, value in self.settings(inputs, output).items():
+            if not hasattr(script, name):
+                raise ValueError(f"{SHAPES[self.shape]} has no option {name!r}")
+            setattr(script, name, URIRef(value) if name in URI_SETTINGS else value)
+        return script
+
+    def stamp(self, inputs, output):
+        """What a run depends on: the shape, the settings and the size and mtime of every source file."""
+        stamp = {"shape": self.shape, "settings": self.settings(inputs, output),
+                 "sources": source_stamps(expand_inputs(inputs))}
+        return json.loads(json.dumps(stamp, default=str))  # as read back from RUN_FILE (tuples become lists)
+
+    def run(self, inputs, output):
+        """
+        Fragment inputs (a file, directory, glob or list of those) into output; returns the run's
+        RunMetrics, or None when an incremental run found nothing to do.
+        """
+        stamp = run_path = None
+        if self.options.get("incremental") or self.options.get("append_only"):
+            stamp = self.stamp(inputs, output)
+            run_path = os.path.join(stamp["settings"]["base_path"], RUN_FILE)  # next to the data it describes
+            if os.path.exists(run_path):
+                with open(run_path, "r", encoding="utf-8") as file:
+                    if json.load(file) == stamp:
+                        print(f"Sources unchanged since the last run, {output} is up to date.")
+                        return None
+        script = self.configure(inputs, output)
+        script.main()
+        if stamp is not None:
+            tmp_path = run_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(stamp, file, indent=1)
+            os.replace(tmp_path, run_path)
+        return script.metrics
+
+    @classmethod
+    def from_config(cls, config):
+        """A pipeline from a config dict (e.g. a JSON file); "input" and "output" are left to run()."""
+        config = {name: value for name, value in config.items() if name not in ("input", "output")}
+        if isinstance(config.get("levels"), list):
+            config["levels"] = tuple(config["levels"])
+        if isinstance(config.get("target_members"), list):
+            config["target_members"] = tuple(config["target_members"])
+        return cls(**config)
+
+
+def add_arguments(parser):
+    """The pipeline options of the command line (ldes_daemon serve takes the same)."""
+    parser.add_argument("input", nargs="*", help="source files, directories or globs (default: the config's input)")
+    parser.add_argument("--config", help="JSON file with the pipeline settings; options given here override it")
+    parser.add_argument("--shape", choices=SHAPES)
+    parser.add_argument("--engine", help="direct, stream (sosa), sparql (tss) or auto")
+    parser.add_argument("--writer", choices=tuple(WRITERS) + ("auto",))
+    parser.add_argument("--output", help="LDES directory, relative to the site root")
+    parser.add_argument("--base-uri", help="URI the output directory is published under")
+    parser.add_argument("--eventstream-uri")
+    parser.add_argument("--home-page")
+    parser.add_argument("--format", dest="output_format", choices=("trig", "nquads"), help="fast writer output format")
+    parser.add_argument("--workers", type=int, help="processes writing fragments")
+    parser.add_argument("--ingest-workers", type=int, help="processes parsing source files")
+    parser.add_argument("--levels", type=lambda text: tuple(text.split(",")), help="e.g. year,month,day")
+    parser.add_argument("--max-members", type=int, help="split buckets with more members into pages")
+    parser.add_argument("--tree-from-index", action="store_true", default=None)
+    parser.add_argument("--incremental", action="store_true", default=None)
+    parser.add_argument("--append-only", action="store_true", default=None)
+    parser.add_argument("--snapshot-cache", action="store_true", default=None)
+    parser.add_argument("--out-of-core", action="store_true", default=None)
+    parser.add_argument("--max-memory", type=parse_size)
+    parser.add_argument("--report", dest="timing_report", help="JSON timing report path")
+    parser.add_argument("--profile", dest="profile_dir", metavar="DIR")
+    parser.add_argument("--profile-memory", action="store_true", default=None)
+    parser.add_argument("--log-level", choices=LOG_LEVELS)
+    parser.add_argument("--log-format", choices=LOG_FORMATS)
+
+
+def from_arguments(parser, args):
+    """(Pipeline, inputs, output) from the parsed options (a dict) and the --config file they name."""
+    args = dict(args)
+    config = {}
+    config_path = args.pop("config")
+    if config_path:
+        with open(config_path, "r", encoding="utf-8") as file:
+            config = json.load(file)
+    inputs = args.pop("input") or config.get("input")
+    output = args.pop("output") or config.get("output")
+    if not inputs or not output:
+        parser.error("an input and --output (or a config with input and output) are required")
+    output = output_path(output)
+    config.update({name: value for name, value in args.items() if value is not None})
+    return Pipeline.from_config(config), inputs, output
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fragment RDF members (SOSA observations or TSS snippets) into an LDES.")
+    add_arguments(parser)
+    try:
+        pipeline, inputs, output = from_arguments(parser, vars(parser.parse_args(argv)))
+    except ValueError as error:  # an engine, writer or option the shape does not have, or a bad output path
+        parser.error(str(error))
+    pipeline.run(inputs, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import cProfile
+import os
+import signal
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+# Per-stage profiling (--profile DIR).
+# RunMetrics hands every stage entry and exit to a StageProfiler, which keeps per stage a
+# cProfile profile (only one profiler can be active, so entering a nested stage pauses the
+# enclosing stage's profile and attributes the time to the inner one) and stacks of the main
+# thread sampled every few milliseconds of CPU time (collapsed "frame;frame;frame count" lines,
+# the input of flamegraph.pl and speedscope). With --profile-memory it also lists the allocators
+# that grew most between tracemalloc snapshots taken around the first call of each stage;
+# tracing and heap snapshots make a run many times slower, so it is off by default.
+# Work done in worker processes is not seen by any of them.
+
+PROFILE_INTERVAL = 0.005  # seconds between stack samples
+MEMORY_CALLS = 1  # snapshots of the whole heap are slow: only the first call(s) of a stage are traced
+TOP_ALLOCATORS = 25
+
+
+def frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Counts collapsed stacks of the main thread under the current stage. A SIGPROF interval
+    timer interrupts the main thread itself where there is one (Unix); elsewhere a thread polls
+    sys._current_frames(), which cProfile then also sees.
+    """
+
+    def __init__(self, profiler, interval=PROFILE_INTERVAL):
+        self.profiler = profiler
+        self.interval = interval
+        self.samples = Counter()  # (stage, collapsed stack) -> samples
+        self.thread_id = threading.get_ident()
+        self.thread = None
+        self.previous_handler = None
+
+    def record(self, frame):
+        stack = self.profiler.stack
+        if not stack or frame is None:
+            return
+        names = []
+        while frame is not None:
+            names.append(frame_name(frame.f_code))
+            frame = frame.f_back
+        self.samples[(stack[-1], ";".join(reversed(names)))] += 1
+
+    def on_signal(self, signum, frame):
+        self.record(frame)
+
+    def poll(self):
+        while not self.stopped.wait(self.interval):
+            self.record(sys._current_frames().get(self.thread_id))
+
+    def start(self):
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            self.previous_handler = signal.signal(signal.SIGPROF, self.on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.stopped = threading.Event()
+            self.thread = threading.Thread(target=self.poll, name="ldes-profile-sampler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+        elif self.previous_handler is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self.previous_handler)
+            self.previous_handler = None
+
+
+class StageProfiler:
+    """cProfile, stack samples and tracemalloc top allocators per stage of one run."""
+
+    def __init__(self, directory, interval=PROFILE_INTERVAL, trace_memory=False):
+        self.directory = directory
+        self.stack = []  # names of the stages entered and not yet left, innermost last
+        self.profiles = {}
+        self.snapshots = []  # tracemalloc snapshot per entered stage (None when not traced)
+        self.allocations = {}  # stage -> Counter of bytes per allocating line
+        self.calls = Counter()
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.sampler = StackSampler(self, interval)
+        self.sampler.start()
+
+    def profile(self, name):
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = self.profiles[name] = cProfile.Profile()
+        return profile
+
+    def snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def enter(self, name):
+        if self.stack:
+            self.profile(self.stack[-1]).disable()
+        self.stack.append(name)
+        self.calls[name] += 1
+        self.snapshots.append(self.snapshot() if self.trace_memory and self.calls[name] <= MEMORY_CALLS else None)
+        self.profile(name).enable()
+
+    def exit(self, name):
+        self.profile(name).disable()
+        self.stack.pop()
+        before = self.snapshots.pop()
+        if before is not None:
+            allocations = self.allocations.setdefault(name, Counter())
+            for stat in self.snapshot().compare_to(before, "lineno"):
+                if stat.size_diff > 0:
+                    allocations[str(stat.traceback)] += stat.size_diff
+        if self.stack:
+            self.profile(self.stack[-1]).enable()
+
+    def write(self):
+        """Stop sampling and write <stage>.pstats, <stage>.collapsed, <stage>.memory.txt and all.collapsed."""
+        self.sampler.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.directory, f"{name}.pstats"))
+        stages = sorted({stage for stage, _ in self.sampler.samples})
+        with open(os.path.join(self.directory, "all.collapsed"), "w", encoding="utf-8") as all_file:
+            for name in stages:
+                with open(os.path.join(self.directory, f"{name}.collapsed"), "w", encoding="utf-8") as file:
+                    for (stage, stack), count in sorted(self.sampler.samples.items()):
+                        if stage == name:
+                            file.write(f"{stack} {count}\n")
+                            all_file.write(f"{name};{stack} {count}\n")
+        for name, allocations in self.allocations.items():
+            with open(os.path.join(self.directory, f"{name}.memory.txt"), "w", encoding="utf-8") as file:
+                file.write(f"# bytes allocated and still held at the end of the stage, first {MEMORY_CALLS} call(s)\n")
+                for line, size in allocations.most_common(TOP_ALLOCATORS):
+                    file.write(f"{size:>14,d}  {line}\n")
+        return self.directory
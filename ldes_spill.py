@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from rdflib import BNode, URIRef
+
+from ldes_table import ObservationTable, TermDictionary, lexical_codes
+from ldes_buckets import bucket_keys, run_bounds
+
+# Out-of-core bucketing.
+# Extracted rows are appended to run files (one per column, per coarse bucket such as a month)
+# as they arrive, so only the current chunk is in memory. The coarse buckets are then read back
+# one at a time in time order and bucketed, sorted and written like an in-memory table: peak
+# memory is one chunk or one coarse bucket, whatever the size of the input.
+
+SPILL_BUDGET = 512 * 2**20  # bytes of extracted rows held in memory before they are spilled
+ROW_BYTES = 200  # rough in-memory cost of one extracted row (record tuple, subject IRI, columns)
+SPILL_COLUMNS = (("ids", np.int64), ("results", np.float64), ("times", np.int64),
+                 ("offsets", np.int32), ("properties", np.int32), ("lexical", np.int32))
+
+
+def spill_level(levels, adaptive=False):
+    """
+    Level of the run files. A fragment must never straddle two of them, so it is at most the
+    leaf level: months for day or hour fragments, the root level when the depth is adaptive.
+    """
+    return levels[0] if adaptive else levels[min(1, len(levels) - 1)]
+
+
+def chunk_rows(budget=SPILL_BUDGET):
+    """Records per extraction chunk for a spill budget in bytes."""
+    return max(1, budget // ROW_BYTES)
+
+
+def encode_subject(term):
+    return f"_:{term}" if isinstance(term, BNode) else str(term)
+
+
+def decode_subject(text):
+    return BNode(text[2:]) if text.startswith("_:") else URIRef(text)
+
+
+class SpillBuckets:
+    """Run files of one out-of-core pass, in a private temporary directory."""
+
+    def __init__(self, level="month", directory=None):
+        self.level = level
+        self.directory = tempfile.mkdtemp(prefix="ldes-spill-", dir=directory)
+        self.property_dict = TermDictionary()
+        self.lexical_dict = TermDictionary()  # the few (id, result) pairs kept as written stay in memory
+        self.counts = {}  # bucket key -> rows spilled
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run_path(self, key, name):
+        return os.path.join(self.directory, f"{key}.{name}")
+
+    def add(self, table):
+        """Append the rows of a table to the run files of their buckets."""
+        if not len(table):
+            return
+        keys = bucket_keys(table.times, table.offsets, self.level)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        property_codes = np.array([self.property_dict.encode(term) for term in table.property_terms], dtype=np.int32)
+        lexical = lexical_codes(self.lexical_dict, table)
+        for start, stop in run_bounds(sorted_keys, 0, len(order)):
+            key = int(sorted_keys[start])
+            rows = order[start:stop]
+            for name, dtype in SPILL_COLUMNS:
+                if name == "properties":
+                    column = property_codes[table.properties[rows]]
+                else:
+                    column = lexical[rows] if name == "lexical" else getattr(table, name)[rows]
+                with open(self.run_path(key, name), "ab") as file:
+                    file.write(column.astype(dtype, copy=False).tobytes())
+            with open(self.run_path(key, "subjects"), "a", encoding="utf-8") as file:
+                file.write("".join(encode_subject(table.subject_terms[code]) + "\n" for code in table.subjects[rows].tolist()))
+            self.counts[key] = self.counts.get(key, 0) + stop - start
+
+    def tables(self):
+        """One ObservationTable per spilled bucket, in time order; run files are removed once read."""
+        for key in sorted(self.counts):
+            columns = {name: np.fromfile(self.run_path(key, name), dtype=dtype) for name, dtype in SPILL_COLUMNS}
+            subject_dict = TermDictionary()
+            with open(self.run_path(key, "subjects"), "r", encoding="utf-8") as file:
+                subjects = np.fromiter((subject_dict.encode(decode_subject(line[:-1])) for line in file),
+                                       dtype=np.int32, count=self.counts[key])
+            for name in [name for name, _ in SPILL_COLUMNS] + ["subjects"]:
+                os.remove(self.run_path(key, name))
+            yield ObservationTable(subjects, columns["ids"], columns["results"], columns["properties"],
+                                   columns["times"], columns["offsets"], subject_dict.values, self.property_dict.values,
+                                   columns["lexical"], self.lexical_dict.values)
+
+
+def collect_tables(tables, level="month", memory=None, directory=None):
+    """
+    Gather extracted tables in memory while the MemoryBudget allows, then spill them and every
+    later table to run files; without a memory budget everything is spilled (out_of_core).
+    Returns (table, None) when nothing was spilled, else (iterable of bucket tables, SpillBuckets)
+    and the caller closes the SpillBuckets once the tables are written.
+    """
+    held = []
+    spill = None
+    for table in tables:
+        if spill is not None:
+            spill.add(table)
+            continue
+        held.append(table)
+        if memory is None or memory.exceeded():
+            spill = SpillBuckets(level, directory)
+            for table in held:
+                spill.add(table)
+            held = []
+    if spill is not None:
+        return spill.tables(), spill
+    return (held[0] if len(held) == 1 else ObservationTable.concatenate(held)), None
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+
+from rdflib import BNode
+
+from ldes_tree import BucketIndex, page_bounds
+
+# Persisted state for incremental runs.
+# For every day bucket the state file keeps a content hash plus the member count and time range.
+# A run only rewrites buckets whose hash changed (or that disappeared) and the tree nodes above
+# them; every other file is left untouched, byte for byte.
+
+STATE_FILE = ".ldes_state.json"
+STATE_VERSION = 1
+
+
+def bucket_name(parts):
+    """State key of a bucket, e.g. (2020, 11, 7) -> "2020/11/07"."""
+    return "/".join(f"{part:04d}" if i == 0 else f"{part:02d}" for i, part in enumerate(parts))
+
+
+def bucket_parts(name):
+    return tuple(int(part) for part in name.split("/"))
+
+
+def digest_table_rows(table, rows):
+    """Content hash of some ObservationTable rows (in bucket order)."""
+    part = table.take(rows)
+    h = hashlib.blake2b(digest_size=16)
+    for column in (part.ids, part.results, part.times, part.offsets):
+        h.update(column.tobytes())
+    h.update(repr([table.lexical_terms[code] for code in part.lexical.tolist() if code >= 0]).encode())
+    h.update("\n".join(str(table.subject_terms[code]) for code in part.subjects.tolist()).encode())
+    h.update("\n".join(str(table.property_terms[code]) for code in part.properties.tolist()).encode())
+    return h.hexdigest()
+
+
+def digest_rows(rows, fields):
+    """Content hash of result rows, e.g. TSS snippets; blank nodes are hashed by position."""
+    h = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        for field in fields:
+            term = row[field]
+            h.update(b"_:" if isinstance(term, BNode) else term.n3().encode())
+            h.update(b"\t")
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def settings_digest(settings):
+    return hashlib.blake2b(json.dumps(settings, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+class IncrementalState:
+    """Bucket hashes from the previous run and the changes found in this one."""
+
+    def __init__(self, path, settings=None):
+        self.path = path
+        self.settings = settings_digest(settings or {})
+        self.buckets = {}
+        self.changed = set()
+        self.seen = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved.get("version") == STATE_VERSION:
+                self.buckets = saved.get("buckets", {})
+                # different output settings invalidate every fragment, but old buckets are still removed
+                if saved.get("settings") != self.settings:
+                    for bucket in self.buckets.values():
+                        bucket["hash"] = None
+
+    def update(self, parts, digest, count, min_time, max_time):
+        """Record a bucket of this run; returns True when it has to be (re)written."""
+        name = bucket_name(parts)
+        self.seen.add(name)
+        previous = self.buckets.get(name)
+        self.buckets[name] = {"hash": digest, "count": count, "min": min_time, "max": max_time}
+        if previous is not None and previous["hash"] == digest:
+            return False
+        self.changed.add(name)
+        return True
+
+    def removed(self):
+        """Buckets of the previous run that are not in this run's data; forgets them."""
+        gone = sorted(set(self.buckets) - self.seen)
+        for name in gone:
+            del self.buckets[name]
+            self.changed.add(name)
+        return [bucket_parts(name) for name in gone]
+
+    def dirty_nodes(self):
+        """Parts of every changed bucket and the tree nodes above it (the root is ()); a paged bucket has its own node."""
+        nodes = set()
+        for name in self.changed:
+            parts = bucket_parts(name)
+            nodes.update(parts[:depth] for depth in range(len(parts) + 1))
+        return nodes
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": STATE_VERSION, "settings": self.settings, "buckets": self.buckets}, file, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+#RDF2LDES##############################################################################################
+# Append-only ingestion.
+# The journal records every day bucket once its new members are safely in the fragment file,
+# together with the high-water mark of the timestamp path. A run only takes members newer than
+# the watermark; a run that was killed resumes after the last committed bucket.
+# Before a bucket's fragments are appended to, an intent line records their sizes. A bucket whose
+# intent is not followed by its commit was being written when the run died: opening the journal
+# truncates its fragments back to the recorded sizes (removes new ones), so the resumed run
+# appends those members exactly once.
+
+JOURNAL_FILE = ".ldes_journal.jsonl"
+
+
+def append_fragment(new_path, file_path):
+    """
+    Atomically append the TriG/N-Quads document in new_path to file_path.
+    Concatenated TriG documents are valid TriG, so old + new is written to a temporary
+    file, synced and renamed over the fragment; a crash leaves either the old or the new file.
+    """
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as old:
+                while chunk := old.read(1 << 20):
+                    out.write(chunk)
+        with open(new_path, "rb") as new:
+            while chunk := new.read(1 << 20):
+                out.write(chunk)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, file_path)
+    os.remove(new_path)
+
+
+class CheckpointJournal:
+    """Append-only journal of committed buckets; replaying it gives the watermark and the bucket index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.buckets = {}
+        self.watermark = None
+        self.pending_tree = set()
+        self.intents = {}  # bucket -> {fragment path relative to the journal: size before the append, None if new}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn last line of a killed run
+                    self.replay(entry)
+        self.recover()
+
+    def replay(self, entry):
+        if entry.get("tree"):
+            self.pending_tree.clear()
+            return
+        if "intent" in entry:
+            self.intents[entry["intent"]] = entry["sizes"]
+            return
+        if "recovered" in entry:
+            self.intents.pop(entry["recovered"], None)
+            return
+        name = entry["bucket"]
+        self.intents.pop(name, None)
+        pages = entry.get("pages") or [[entry["count"], entry["min"], entry["max"]]]
+        self.buckets[name] = {"count": entry["count"], "min": entry["min"], "max": entry["max"], "pages": pages}
+        self.watermark = entry["watermark"]
+        self.pending_tree.add(name)
+
+    def append(self, entry):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.replay(entry)
+
+    def fragment_path(self, relative):
+        return os.path.join(os.path.dirname(self.path), relative)
+
+    def begin_bucket(self, parts, file_paths):
+        """Record the current size of the fragments a bucket's new members are about to be appended to."""
+        sizes = {}
+        for file_path in file_paths:
+            relative = os.path.relpath(file_path, os.path.dirname(self.path) or ".")
+            sizes[relative] = os.path.getsize(file_path) if os.path.exists(file_path) else None
+        self.append({"intent": bucket_name(parts), "sizes": sizes})
+
+    def recover(self):
+        """Undo the appends of buckets that were begun but not committed by a killed run."""
+        for name, sizes in list(self.intents.items()):
+            for relative, size in sizes.items():
+                file_path = self.fragment_path(relative)
+                if size is None:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                elif os.path.exists(file_path) and os.path.getsize(file_path) > size:
+                    with open(file_path, "r+b") as file:
+                        file.truncate(size)
+                        file.flush()
+                        os.fsync(file.fileno())
+            self.append({"recovered": name})
+
+    def pages(self, parts):
+        """[count, min, max] per page of a committed bucket (empty for a new bucket)."""
+        bucket = self.buckets.get(bucket_name(parts))
+        return [list(page) for page in bucket["pages"]] if bucket else []
+
+    def plan_pages(self, parts, times, max_members=None):
+        """
+        Decide where the new (sorted) member times of a bucket go: onto its last page when that
+        stays within max_members, otherwise onto new pages. Returns ([(page, start, end)], pages)
+        with row offsets into times and the bucket's updated page list.
+        """
+        pages = self.pages(parts)
+        count = len(times)
+        if pages and (not max_members or pages[-1][0] + count <= max_members):
+            plan = [(len(pages) - 1, 0, count)]
+        else:
+            plan = [(len(pages) + page, start, end) for page, (start, end) in enumerate(page_bounds(times, max_members))]
+        for page, start, end in plan:
+            if page < len(pages):
+                pages[page] = [pages[page][0] + end - start, pages[page][1], int(times[end - 1])]
+            else:
+                pages.append([end - start, int(times[start]), int(times[end - 1])])
+        return plan, pages
+
+    def commit_bucket(self, parts, pages):
+        """Record the complete page list of a bucket after its new members were appended."""
+        count = sum(page[0] for page in pages)
+        min_time = min(page[1] for page in pages)
+        max_time = max(page[2] for page in pages)
+        watermark = max_time if self.watermark is None else max(self.watermark, max_time)
+        self.append({"bucket": bucket_name(parts), "count": count, "min": min_time, "max": max_time,
+                     "pages": pages, "watermark": watermark})
+
+    def commit_tree(self):
+        """The tree nodes above every committed bucket are up to date."""
+        self.append({"tree": True})
+
+    def dirty_nodes(self):
+        """Buckets committed since the last tree commit and the tree nodes above them."""
+        nodes = set()
+        for name in self.pending_tree:
+            parts = bucket_parts(name)
+            nodes.update(parts[:depth] for depth in range(len(parts) + 1))
+        return nodes
+
+    def index(self):
+        """BucketIndex over every bucket ever committed."""
+        index = BucketIndex()
+        for name, bucket in self.buckets.items():
+            index.add_bucket(bucket_parts(name), bucket["count"], bucket["min"], bucket["max"], bucket["pages"])
+        return index
+
+    def compact(self):
+        """Rewrite the journal with one line per bucket."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for name in sorted(self.buckets):
+                bucket = self.buckets[name]
+                file.write(json.dumps({"bucket": name, **bucket, "watermark": self.watermark}) + "\n")
+            if not self.pending_tree:
+                file.write(json.dumps({"tree": True}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
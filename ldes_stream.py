@@ -0,0 +1,450 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import re
+import sys
+import threading
+from datetime import datetime
+from urllib.parse import urljoin
+
+from rdflib import URIRef, Literal, BNode
+
+# Streaming reader for Turtle / N-Triples sources.
+# Unlike load_graph() it never builds an rdflib Graph: the file is lexed in chunks,
+# triples are produced one by one and observations are yielded as soon as they are complete.
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD_NS = "http://www.w3.org/2001/XMLSchema#"
+XSD_STRING = XSD_NS + "string"
+XSD_INTEGER = XSD_NS + "integer"
+XSD_DECIMAL = XSD_NS + "decimal"
+XSD_DOUBLE = XSD_NS + "double"
+XSD_BOOLEAN = XSD_NS + "boolean"
+
+SOSA_OBSERVATION = "http://www.w3.org/ns/sosa/Observation"
+SOSA_RESULT = "http://www.w3.org/ns/sosa/hasSimpleResult"
+SOSA_PROPERTY = "http://www.w3.org/ns/sosa/observedProperty"
+SOSA_TIME = "http://www.w3.org/ns/sosa/resultTime"
+EX_ID = "http://example.org/id"
+
+CHUNK_SIZE = 1 << 20
+# tokens ending this close to the end of the buffer may still grow (e.g. "1." + "5")
+LOOKAHEAD = 8
+
+_TOKEN = re.compile(r"""
+    (?P<ws>\s+|\#[^\n]*)
+  | (?P<iri><[^<>"{}|^`\\\s]*>)
+  | (?P<lstring>\"\"\"(?:[^"\\]|\\.|"(?!""))*\"\"\"|'''(?:[^'\\]|\\.|'(?!''))*''')
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<dtype>\^\^)
+  | (?P<at>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+  | (?P<bnode>_:[A-Za-z0-9_](?:[\w\-.]*[\w\-])?)
+  | (?P<number>[+-]?(?:\d*\.\d+(?:[eE][+-]?\d+)?|\d+[eE][+-]?\d+|\d+))
+  | (?P<pname>(?:[A-Za-z][\w\-.]*)?:(?:(?:[\w\-:%]|\\.)(?:(?:[\w\-:%.]|\\.)*(?:[\w\-:%]|\\.))?)?)
+  | (?P<word>[A-Za-z]+)
+  | (?P<punct>[.;,\[\]()])
+""", re.VERBOSE | re.DOTALL)
+
+_ESCAPE = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)", re.DOTALL)
+_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f"}
+_LOCAL_ESCAPE = re.compile(r"\\(.)")
+
+
+def _unescape(match):
+    esc = match.group(1)
+    if esc[0] in "uU" and len(esc) > 1:
+        return chr(int(esc[1:], 16))
+    return _ESCAPES.get(esc, esc)
+
+
+# compressed sources are recognised by their magic bytes, or else by their extension
+COMPRESSION_MAGIC = ((b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz"), (b"\x28\xb5\x2f\xfd", "zstd"))
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".zst": "zstd"}
+DECOMPRESS_QUEUE = 8  # decompressed chunks buffered ahead of the parser
+
+
+def detect_compression(input_path):
+    """"gzip", "bz2", "xz", "zstd" or None for a plain file."""
+    with open(input_path, "rb") as file:
+        head = file.read(6)
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(input_path)[1].lower())
+
+
+def open_decompressed(input_path, compression):
+    if compression == "gzip":
+        return gzip.open(input_path, "rb")
+    if compression == "bz2":
+        return bz2.open(input_path, "rb")
+    if compression == "xz":
+        return lzma.open(input_path, "rb")
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd.open(input_path, "rb")
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(f"Reading {input_path} needs zstd support: install the zstandard package") from None
+    return zstandard.ZstdDecompressor().stream_reader(open(input_path, "rb"), closefd=True)
+
+
+class ThreadedReader(io.RawIOBase):
+    """
+    Reads a (decompressing) binary stream on a background thread.
+    The zlib / bz2 / lzma decompressors release the GIL, so decompression of the next chunks
+    overlaps with tokenizing the current one; a bounded queue keeps memory use flat.
+    """
+
+    def __init__(self, source, chunk_size=CHUNK_SIZE, depth=DECOMPRESS_QUEUE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(depth)
+        self.pending = memoryview(b"")
+        self.eof = False
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.pump, daemon=True)
+        self.thread.start()
+
+    def pump(self):
+        try:
+            while not self.stop.is_set():
+                chunk = self.source.read(self.chunk_size)
+                self.queue.put(chunk)  # b"" marks the end
+                if not chunk:
+                    return
+        except BaseException as error:
+            self.queue.put(error)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            if self.eof:
+                return 0
+            chunk = self.queue.get()
+            if isinstance(chunk, BaseException):
+                raise chunk
+            if not chunk:
+                self.eof = True
+                return 0
+            self.pending = memoryview(chunk)
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stop.set()
+            while self.thread.is_alive():
+                try:
+                    self.queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self.source.close()
+        super().close()
+
+
+def open_source(input_path, binary=False):
+    """
+    Open a source file for streaming, as text (or bytes for rdflib's parser).
+    .gz / .bz2 / .xz / .zst sources are decompressed on the fly on a background thread,
+    so no decompressed copy is ever written to disk.
+    """
+    compression = detect_compression(input_path)
+    if compression is None:
+        return open(input_path, "rb") if binary else open(input_path, "r", encoding="utf-8")
+    stream = io.BufferedReader(ThreadedReader(open_decompressed(input_path, compression)), CHUNK_SIZE)
+    return stream if binary else io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def tokenize(stream, chunk_size=CHUNK_SIZE):
+    """
+    Lex a Turtle / N-Triples text stream into (kind, lexeme) tokens.
+    Only one chunk (plus a possibly unfinished token) is kept in memory at a time.
+    """
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        if pos == len(buffer):
+            if eof:
+                return
+            match = None
+        else:
+            match = _TOKEN.match(buffer, pos)
+        # a token close to the end of the buffer may continue in the next chunk
+        if not eof and (match is None or match.end() > len(buffer) - LOOKAHEAD
+                        or match.lastgroup == "string" and buffer.startswith(('"""', "'''"), pos)):
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        if match is None:
+            raise ValueError(f"Unexpected input near: {buffer[pos:pos + 40]!r}")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind != "ws":
+            yield kind, match.group()
+
+
+class _TripleReader:
+    """Recursive-descent parser turning tokens into (s, p, o) triples.
+
+    IRIs are plain strings, blank nodes are BNode instances and literals are
+    (lexical, datatype, language) tuples so no rdflib terms are built per triple.
+    Predicate, datatype and object IRIs are interned: a property or sensor IRI that
+    appears on every observation is one string object, not one per triple.
+    """
+
+    def __init__(self, tokens, base):
+        self.tokens = tokens
+        self.base = base
+        self.prefixes = {}
+        self.lookahead = None
+        self.bnodes = {}
+
+    def next(self):
+        if self.lookahead is not None:
+            token, self.lookahead = self.lookahead, None
+            return token
+        return next(self.tokens, (None, None))
+
+    def peek(self):
+        if self.lookahead is None:
+            self.lookahead = next(self.tokens, (None, None))
+        return self.lookahead
+
+    def expect(self, lexeme):
+        kind, value = self.next()
+        if value != lexeme:
+            raise ValueError(f"Expected {lexeme!r} but found {value!r}")
+
+    def resolve(self, iri):
+        if self.base and not re.match(r"[A-Za-z][A-Za-z0-9+.\-]*:", iri):
+            return urljoin(self.base, iri)
+        return iri
+
+    def iri(self, kind, value):
+        if kind == "iri":
+            iri = value[1:-1]
+            if "\\" in iri:
+                iri = _ESCAPE.sub(_unescape, iri)
+            return self.resolve(iri)
+        if kind == "pname":
+            prefix, _, local = value.partition(":")
+            if prefix not in self.prefixes:
+                raise ValueError(f"Undeclared prefix {prefix!r}")
+            if "\\" in local:
+                local = _LOCAL_ESCAPE.sub(r"\1", local)
+            return self.prefixes[prefix] + local
+        if kind == "word" and value == "a":
+            return RDF_TYPE
+        raise ValueError(f"Expected an IRI but found {value!r}")
+
+    def triples(self):
+        while True:
+            kind, value = self.next()
+            if kind is None:
+                return
+            if kind == "at" or (kind == "word" and value.upper() in ("PREFIX", "BASE")):
+                self.directive(kind, value)
+                continue
+            if kind == "punct" and value == "[":
+                subject = BNode()
+                if self.peek()[1] == "]":
+                    self.next()
+                else:
+                    yield from self.predicate_objects(subject)
+                    self.expect("]")
+                if self.peek()[1] == ".":
+                    self.next()
+                    continue
+            else:
+                subject = self.subject(kind, value)
+            yield from self.predicate_objects(subject)
+            self.expect(".")
+
+    def directive(self, kind, value):
+        sparql_style = kind == "word"
+        keyword = value.lstrip("@").lower()
+        if keyword == "prefix":
+            pkind, pname = self.next()
+            if pkind != "pname" or not pname.endswith(":"):
+                raise ValueError(f"Invalid prefix declaration {pname!r}")
+            ikind, iri = self.next()
+            self.prefixes[pname[:-1]] = self.iri(ikind, iri)
+        elif keyword == "base":
+            ikind, iri = self.next()
+            self.base = self.iri(ikind, iri)
+        else:
+            raise ValueError(f"Unknown directive {value!r}")
+        if not sparql_style:
+            self.expect(".")
+
+    def subject(self, kind, value):
+        if kind == "bnode":
+            return self.blank(value)
+        if kind == "punct" and value == "(":
+            raise ValueError("RDF collections are not supported by the streaming reader")
+        return self.iri(kind, value)
+
+    def blank(self, label):
+        node = self.bnodes.get(label)
+        if node is None:
+            node = self.bnodes[label] = BNode()
+        return node
+
+    def predicate_objects(self, subject):
+        while True:
+            kind, value = self.next()
+            predicate = sys.intern(self.iri(kind, value))
+            while True:
+                pending = []
+                obj = self.object(pending)
+                yield subject, predicate, obj
+                yield from pending
+                if self.peek()[1] == ",":
+                    self.next()
+                    continue
+                break
+            # ';' may be repeated and may trail the list
+            if self.peek()[1] != ";":
+                return
+            while self.peek()[1] == ";":
+                self.next()
+            if self.peek()[1] in (".", "]", None):
+                return
+
+    def object(self, pending):
+        kind, value = self.next()
+        if kind in ("string", "lstring"):
+            quote = 3 if kind == "lstring" else 1
+            lexical = value[quote:-quote]
+            if "\\" in lexical:
+                lexical = _ESCAPE.sub(_unescape, lexical)
+            nkind, nvalue = self.peek()
+            if nkind == "at":
+                self.next()
+                return (lexical, None, nvalue[1:])
+            if nkind == "dtype":
+                self.next()
+                return (lexical, sys.intern(self.iri(*self.next())), None)
+            return (lexical, None, None)
+        if kind == "number":
+            if "e" in value or "E" in value:
+                return (value, XSD_DOUBLE, None)
+            return (value, XSD_DECIMAL if "." in value else XSD_INTEGER, None)
+        if kind == "word" and value in ("true", "false"):
+            return (value, XSD_BOOLEAN, None)
+        if kind == "bnode":
+            return self.blank(value)
+        if kind == "punct" and value == "[":
+            node = BNode()
+            if self.peek()[1] != "]":
+                pending.extend(self.predicate_objects(node))
+            self.expect("]")
+            return node
+        if kind == "punct" and value == "(":
+            raise ValueError("RDF collections are not supported by the streaming reader")
+        return sys.intern(self.iri(kind, value))
+
+
+def stream_triples(input_path, base="https://example.org/"):
+    """Yield (s, p, o) triples from a Turtle or N-Triples file without loading it into a Graph."""
+    with open_source(input_path) as stream:
+        yield from _TripleReader(tokenize(stream), base).triples()
+
+
+#RDF2LDES##############################################################################################
+
+def literal_value(term):
+    """Convert a streamed term to the same Python value rdflib's toPython() would give."""
+    if not isinstance(term, tuple):
+        return str(term)
+    lexical, datatype, lang = term
+    if datatype is None or datatype == XSD_STRING:
+        return lexical
+    if datatype == XSD_NS + "int" or datatype == XSD_INTEGER or datatype == XSD_NS + "long":
+        try:
+            return int(lexical)
+        except ValueError:
+            pass
+    return Literal(lexical, lang=lang, datatype=URIRef(datatype)).toPython()
+
+
+def result_value(term):
+    """Same float-or-string fallback as extract_observations()."""
+    lexical = term[0] if isinstance(term, tuple) else str(term)
+    try:
+        return float(literal_value(term))
+    except Exception:
+        try:
+            return float(lexical)
+        except Exception:
+            return lexical
+
+
+def time_value(term):
+    """Parse an xsd:dateTime term into a datetime object."""
+    lexical = term[0] if isinstance(term, tuple) else str(term)
+    try:
+        return datetime.fromisoformat(lexical)
+    except ValueError:
+        time_val = literal_value(term)
+        if not isinstance(time_val, datetime):
+            time_val = datetime.fromisoformat(str(time_val))
+        return time_val
+
+
+OBSERVATION_FIELDS = {EX_ID: 0, SOSA_RESULT: 1, SOSA_PROPERTY: 2, SOSA_TIME: 3}
+
+
+def stream_observations(input_path, base="https://example.org/"):
+    """
+    Streaming counterpart of load_graph() + extract_observations().
+    Yields (obs, id, result, property, time_as_datetime) tuples as soon as a subject
+    is typed sosa:Observation and has all four properties. Incomplete subjects are kept with
+    their values, completed ones only by name until the end of the file: the triples of a
+    subject need not be contiguous, and later triples about an observation already yielded
+    are ignored. Like Graph.value(), the first value seen for a property wins.
+    """
+    pending = {}
+    done = set()
+    for s, p, o in stream_triples(input_path, base):
+        if p == RDF_TYPE:
+            if o != SOSA_OBSERVATION:
+                continue
+            index = 4
+        else:
+            index = OBSERVATION_FIELDS.get(p)
+            if index is None:
+                continue
+        if s in done:
+            continue
+        record = pending.get(s)
+        if record is None:
+            record = pending[s] = [None, None, None, None, False]
+        if index == 4:
+            record[4] = True
+        elif record[index] is None:
+            record[index] = o
+        else:
+            continue
+        if record[4] and None not in record:
+            del pending[s]
+            done.add(s)
+            id_node, result_node, prop_node, time_node, _ = record
+            obs = s if isinstance(s, BNode) else URIRef(s)
+            yield (obs, literal_value(id_node), result_value(result_node),
+                   literal_value(prop_node), time_value(time_node))
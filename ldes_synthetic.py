@@ -0,0 +1,87 @@
+import gzip
+import random
+from datetime import datetime, timedelta, timezone
+
+# Synthetic sources for benchmarks.
+# Both generators write Turtle shaped like the Mol Sluis Dessel exports the scripts were written
+# for: every sensor reports every property readings times a day, at evenly spaced instants with a
+# little jitter, so the day buckets are evenly filled. Output is deterministic for a given seed;
+# a path ending in .gz is written compressed.
+
+START = datetime(2020, 11, 1, tzinfo=timezone.utc)
+
+SOSA_PREFIXES = """@prefix sosa: <http://www.w3.org/ns/sosa/> .
+@prefix ex: <http://example.org/> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+"""
+
+TSS_PREFIXES = """@prefix sosa: <http://www.w3.org/ns/sosa/> .
+@prefix tss: <https://w3id.org/tss#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+"""
+
+
+def open_output(path):
+    return gzip.open(path, "wt", encoding="utf-8") if path.endswith(".gz") else open(path, "w", encoding="utf-8")
+
+
+def format_time(time_):
+    return time_.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def reading_times(rng, days, readings, start=START):
+    """Start time of every reading slot, readings evenly spread over each day with some jitter."""
+    step = 86400 / readings
+    for day in range(days):
+        day_start = start + timedelta(days=day)
+        for reading in range(readings):
+            yield day_start + timedelta(seconds=int(reading * step + rng.random() * step))
+
+
+def write_observations(path, days=7, sensors=4, properties=3, readings=24, seed=0, start=START):
+    """
+    Write days * sensors * properties * readings sosa:Observation resources; returns their count.
+    Properties are plain literals ("property0", ...), as in the SOSA source.
+    """
+    rng = random.Random(seed)
+    count = 0
+    with open_output(path) as file:
+        file.write(SOSA_PREFIXES)
+        for time_ in reading_times(rng, days, readings, start):
+            for sensor in range(sensors):
+                for property_ in range(properties):
+                    file.write(f"<observation/{count}> a sosa:Observation ;\n"
+                               f"    ex:id \"{count}\"^^xsd:int ;\n"
+                               f"    sosa:madeBySensor <sensor/{sensor}> ;\n"
+                               f"    sosa:hasSimpleResult \"{rng.uniform(0, 10):.3f}\"^^xsd:float ;\n"
+                               f"    sosa:observedProperty \"property{property_}\" ;\n"
+                               f"    sosa:resultTime \"{format_time(time_)}\"^^xsd:dateTime .\n\n")
+                    count += 1
+    return count
+
+
+def write_snippets(path, days=7, sensors=4, properties=3, readings=24, points=60, seed=0, start=START):
+    """
+    Write days * sensors * properties * readings tss:Snippet resources of points values each;
+    every snippet has its own blank node tss:PointTemplate. Returns the snippet count.
+    """
+    rng = random.Random(seed)
+    length = timedelta(seconds=86400 // readings)
+    count = 0
+    with open_output(path) as file:
+        file.write(TSS_PREFIXES)
+        for time_ in reading_times(rng, days, readings, start):
+            for sensor in range(sensors):
+                for property_ in range(properties):
+                    values = ",".join(f"{rng.uniform(0, 10):.3f}" for _ in range(points))
+                    file.write(f"<snippet/{count}> a tss:Snippet ;\n"
+                               f"  tss:about [ a tss:PointTemplate ; sosa:madeBySensor <sensor/{sensor}> ;"
+                               f" sosa:observedProperty <property/{property_}> ] ;\n"
+                               f"  tss:from \"{format_time(time_)}\"^^xsd:dateTime ;\n"
+                               f"  tss:to \"{format_time(time_ + length)}\"^^xsd:dateTime ;\n"
+                               f"  tss:pointType \"float\" ;\n"
+                               f"  tss:points \"[{values}]\" .\n\n")
+                    count += 1
+    return count
@@ -0,0 +1,201 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import numpy as np
+
+# Columnar storage for extracted observations.
+# One ObservationTable replaces the list of (obs, id, result, property, time) tuples:
+# numbers live in NumPy arrays and repeated terms are dictionary coded.
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NAIVE = np.iinfo(np.int32).min  # offset marker for datetimes without a timezone
+ID_RANGE = np.iinfo(np.int64)
+CHUNK_ROWS = 1 << 16
+
+
+def datetime_to_ns(time_):
+    """Epoch nanoseconds of a datetime (naive datetimes are read as UTC)."""
+    if time_.tzinfo is None:
+        time_ = time_.replace(tzinfo=timezone.utc)
+    delta = time_ - EPOCH
+    return ((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds) * 1000
+
+
+@lru_cache(maxsize=None)
+def fixed_zone(offset):
+    """One shared tzinfo per UTC offset instead of one per decoded timestamp."""
+    return timezone(timedelta(seconds=offset))
+
+
+def ns_to_datetime(ns, offset=NAIVE):
+    """Inverse of datetime_to_ns(), restoring the original UTC offset."""
+    time_ = EPOCH + timedelta(microseconds=int(ns) // 1000)
+    if offset == NAIVE:
+        return time_.replace(tzinfo=None)
+    return time_.astimezone(fixed_zone(int(offset)))
+
+
+class TermDictionary:
+    """Maps each distinct value to a small integer code."""
+
+    def __init__(self, values=None):
+        self.values = []
+        self.codes = {}
+        for value in values or ():
+            self.encode(value)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+def lexical_codes(dictionary, table):
+    """The lexical column of table recoded onto dictionary (a shared TermDictionary); -1 stays -1."""
+    codes = np.array([dictionary.encode(term) for term in table.lexical_terms] + [-1], dtype=np.int32)
+    return codes[table.lexical]  # code -1 picks the appended -1
+
+
+class ObservationTable:
+    """
+    Parallel arrays holding one row per observation:
+    times (int64 epoch ns), offsets (int32 UTC offset seconds), results (float64),
+    ids (int64) and dictionary coded subject / property columns.
+    An id that is not an integer or a result that is not a number is kept as the scripts always
+    wrote it: the lexical column codes the row's (id, result) pair in lexical_terms, -1 for a
+    row whose values are in ids and results.
+    """
+
+    def __init__(self, subjects, ids, results, properties, times, offsets, subject_terms, property_terms,
+                 lexical=None, lexical_terms=None):
+        self.subjects = subjects
+        self.ids = ids
+        self.results = results
+        self.properties = properties
+        self.times = times
+        self.offsets = offsets
+        self.subject_terms = subject_terms
+        self.property_terms = property_terms
+        self.lexical = np.full(len(times), -1, np.int32) if lexical is None else lexical
+        self.lexical_terms = [] if lexical_terms is None else lexical_terms
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0, np.float64),
+                   np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0, np.int32), [], [])
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a table from (obs, id, result, property, time) tuples.
+        Records are consumed in chunks, so a generator such as stream_observations()
+        never has to be materialised as a list. An id that is not an int64 or a result that is
+        not a float (the extractors fall back to the string) goes to the lexical column.
+        """
+        subject_dict = TermDictionary()
+        property_dict = TermDictionary()
+        lexical_dict = TermDictionary()
+        chunks = []
+        rows = [[] for _ in range(7)]
+
+        def flush():
+            chunks.append((
+                np.array(rows[0], dtype=np.int32),
+                np.array(rows[1], dtype=np.int64),
+                np.array(rows[2], dtype=np.float64),
+                np.array(rows[3], dtype=np.int32),
+                np.array(rows[4], dtype=np.int64),
+                np.array(rows[5], dtype=np.int32),
+                np.array(rows[6], dtype=np.int32),
+            ))
+            for column in rows:
+                column.clear()
+
+        for obs, id_, result_value, property_, time_ in records:
+            offset = time_.utcoffset()
+            rows[0].append(subject_dict.encode(obs))
+            if isinstance(id_, int) and ID_RANGE.min <= id_ <= ID_RANGE.max and isinstance(result_value, float):
+                rows[1].append(id_)
+                rows[2].append(result_value)
+                rows[6].append(-1)
+            else:
+                rows[1].append(0)
+                rows[2].append(np.nan)
+                rows[6].append(lexical_dict.encode((id_ if isinstance(id_, int) else str(id_),
+                                                    result_value if isinstance(result_value, float) else str(result_value))))
+            rows[3].append(property_dict.encode(property_))
+            rows[4].append(datetime_to_ns(time_))
+            rows[5].append(NAIVE if offset is None else int(offset.total_seconds()))
+            if len(rows[0]) == CHUNK_ROWS:
+                flush()
+        if rows[0] or not chunks:
+            flush()
+
+        columns = [np.concatenate([chunk[i] for chunk in chunks]) for i in range(7)]
+        return cls(columns[0], columns[1], columns[2], columns[3], columns[4], columns[5],
+                   subject_dict.values, property_dict.values, columns[6], lexical_dict.values)
+
+    @classmethod
+    def chunks(cls, records, chunk_rows=CHUNK_ROWS):
+        """Yield tables of at most chunk_rows records each (each with its own dictionaries)."""
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == chunk_rows:
+                yield cls.from_records(batch)
+                batch = []
+        if batch:
+            yield cls.from_records(batch)
+
+    @classmethod
+    def concatenate(cls, tables):
+        """One table holding the rows of several; dictionary codes are remapped onto shared dictionaries."""
+        if not tables:
+            return cls.empty()
+        subject_dict = TermDictionary()
+        property_dict = TermDictionary()
+        lexical_dict = TermDictionary()
+        subjects, properties, lexical = [], [], []
+        for table in tables:
+            subject_codes = np.array([subject_dict.encode(term) for term in table.subject_terms], dtype=np.int32)
+            property_codes = np.array([property_dict.encode(term) for term in table.property_terms], dtype=np.int32)
+            subjects.append(subject_codes[table.subjects])
+            properties.append(property_codes[table.properties])
+            lexical.append(lexical_codes(lexical_dict, table))
+        return cls(np.concatenate(subjects), np.concatenate([table.ids for table in tables]),
+                   np.concatenate([table.results for table in tables]), np.concatenate(properties),
+                   np.concatenate([table.times for table in tables]), np.concatenate([table.offsets for table in tables]),
+                   subject_dict.values, property_dict.values, np.concatenate(lexical), lexical_dict.values)
+
+    def __len__(self):
+        return len(self.times)
+
+    def take(self, indices):
+        """A new table with the selected rows (dictionaries are shared)."""
+        return ObservationTable(self.subjects[indices], self.ids[indices], self.results[indices],
+                                self.properties[indices], self.times[indices], self.offsets[indices],
+                                self.subject_terms, self.property_terms, self.lexical[indices], self.lexical_terms)
+
+    def newer_than(self, watermark):
+        """Rows with a timestamp strictly after watermark (epoch ns); every row when it is None."""
+        if watermark is None:
+            return self
+        return self.take(np.flatnonzero(self.times > watermark))
+
+    def records(self, indices=None):
+        """Decode rows back into (obs, id, result, property, time) tuples for the serializers."""
+        table = self if indices is None else self.take(indices)
+        subject_terms = self.subject_terms
+        property_terms = self.property_terms
+        for subject, id_, result_value, property_, time_, offset, lexical in zip(
+                table.subjects.tolist(), table.ids.tolist(), table.results.tolist(),
+                table.properties.tolist(), table.times.tolist(), table.offsets.tolist(), table.lexical.tolist()):
+            if lexical >= 0:
+                id_, result_value = self.lexical_terms[lexical]
+            yield (subject_terms[subject], id_, result_value, property_terms[property_],
+                   ns_to_datetime(time_, offset))
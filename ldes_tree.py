@@ -0,0 +1,238 @@
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from rdflib import BNode, Literal, Namespace, URIRef
+from rdflib.namespace import RDF, XSD
+
+# LDES tree built from the fragmenter's own bucket index.
+# divide_data() records every bucket it writes (member count, min/max timestamp) in a
+# BucketIndex; the root, year and month nodes are then generated from that index in one
+# pass, without walking the output directory or re-deriving dates from path parts.
+
+TREE = Namespace("https://w3id.org/tree#")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+PART_FORMATS = ("{:04d}", "{:02d}", "{:02d}", "{:02d}")
+
+
+def next_start(start, depth):
+    """First instant of the year / month / day / hour (depth 1 to 4) after the one starting at start."""
+    if depth == 1:
+        return start.replace(year=start.year + 1)
+    if depth == 2:
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + (timedelta(days=1) if depth == 3 else timedelta(hours=1))
+
+
+class TreeNode:
+    """One directory of the output tree with aggregates over all members below it."""
+
+    def __init__(self, parts=(), names=None, bounds=None):
+        self.parts = parts
+        self.dir_names = calendar_names(parts) if names is None else names
+        self.bounds = bounds
+        self.children = {}
+        self.count = 0
+        self.min_time = None
+        self.max_time = None
+
+    def add(self, count, min_time, max_time):
+        self.count += count
+        self.min_time = min_time if self.min_time is None else min(self.min_time, min_time)
+        self.max_time = max_time if self.max_time is None else max(self.max_time, max_time)
+
+    def is_leaf(self):
+        return not self.children
+
+    def names(self):
+        """Directory names of this node below the output directory, e.g. ("2020", "11")."""
+        return self.dir_names
+
+    def start(self):
+        """First instant covered by this node (UTC)."""
+        if self.bounds is not None:
+            return self.bounds[0]
+        parts = self.parts + (1,) * (3 - min(len(self.parts), 3))
+        return datetime(*parts, tzinfo=timezone.utc)
+
+    def end(self):
+        """First instant after this node."""
+        if self.bounds is not None:
+            return self.bounds[1]
+        return next_start(self.start(), len(self.parts))
+
+
+def calendar_names(parts):
+    return tuple(PART_FORMATS[i].format(part) for i, part in enumerate(parts))
+
+
+def ns_to_utc(ns):
+    return EPOCH + timedelta(microseconds=int(ns) // 1000)
+
+
+def page_bounds(times, max_members=None):
+    """
+    Split the sorted epoch ns times of one bucket into pages of at most max_members rows.
+    Members sharing a timestamp always stay on one page (so a page may run over), which keeps
+    every page boundary an exact timestamp. Returns (start, end) row offsets per page.
+    """
+    count = len(times)
+    if not max_members or count <= max_members:
+        return [(0, count)]
+    pages = []
+    start = 0
+    while start < count:
+        end = start + max_members
+        if end >= count:
+            end = count
+        else:
+            end = int(np.searchsorted(times, times[end], side="left"))
+            if end <= start:
+                end = int(np.searchsorted(times, times[start], side="right"))
+        pages.append((start, end))
+        start = end
+    return pages
+
+
+def page_dir(day_dir, page):
+    """Page 0 lives in the day directory itself, so an unpaged day keeps the usual layout."""
+    return day_dir if page == 0 else os.path.join(day_dir, f"page{page}")
+
+
+def remove_stale_pages(day_dir, page_count):
+    """Remove page directories left over from a run that split this day into more pages."""
+    if not os.path.isdir(day_dir):
+        return
+    for entry in os.listdir(day_dir):
+        if entry.startswith("page") and entry[4:].isdigit() and int(entry[4:]) >= page_count:
+            shutil.rmtree(os.path.join(day_dir, entry))
+
+
+class BucketIndex:
+    """Hierarchical index of the buckets produced by one fragmentation run."""
+
+    def __init__(self):
+        self.root = TreeNode()
+
+    def add_bucket(self, parts, count, min_time, max_time, pages=None):
+        """
+        Add a leaf bucket; pages is an optional list of (count, min, max) per page. A bucket with
+        more than one page becomes an inner node whose pages are bounded by their first timestamps.
+        Buckets are calendar days of the members' own wall clock, so with a UTC offset the day's
+        bounds are not instants of its members; the outer page bounds only widen to them.
+        """
+        node = self.root
+        node.add(count, min_time, max_time)
+        for depth in range(len(parts)):
+            node = node.children.setdefault(parts[depth], TreeNode(tuple(parts[:depth + 1])))
+            node.add(count, min_time, max_time)
+        if pages and len(pages) > 1:
+            node.children = {}
+            starts = [ns_to_utc(page_min) for _, page_min, _ in pages]
+            starts[0] = min(starts[0], node.start())
+            ends = starts[1:] + [max(ns_to_utc(pages[-1][2]) + timedelta(microseconds=1), node.end())]
+            for page, (page_count, page_min, page_max) in enumerate(pages):
+                names = node.names() + (() if page == 0 else (f"page{page}",))
+                child = node.children[page] = TreeNode(node.parts + (page,), names, (starts[page], ends[page]))
+                child.add(page_count, page_min, page_max)
+        return node
+
+    def add_buckets(self, buckets, max_members=None):
+        """Add every bucket of one bucketing pass (a run may make several, e.g. out of core)."""
+        for parts, part in buckets.slices():
+            times = buckets.times[buckets.order[part]]
+            pages = [(end - start, int(times[start]), int(times[end - 1]))
+                     for start, end in page_bounds(times, max_members)]
+            self.add_bucket(parts, part.stop - part.start, int(times[0]), int(times[-1]), pages)
+        return self
+
+    @classmethod
+    def from_buckets(cls, buckets, max_members=None):
+        return cls().add_buckets(buckets, max_members)
+
+    def nodes(self):
+        """All nodes, parents before children."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children[key] for key in sorted(node.children, reverse=True))
+
+    def leaves(self):
+        return (node for node in self.nodes() if node.is_leaf() and node.parts)
+
+
+def node_file_name(directory, node):
+    """Name of a tree node file, e.g. LDES/2020/11/11.trig (the root is LDES/LDES.trig)."""
+    root = Path(directory).as_posix()
+    names = node.names()
+    last = names[-1] if names else Path(root).parts[-1]
+    return "/".join((root,) + names + (f"{last}.trig",))
+
+
+def write_tree_nodes(index, directory, base_uri, home_page, eventstream_uri, tree_path,
+                     create_base_graph, leaf_name="readings.trig", log=None, only=None):
+    """
+    Write one node file per inner node of the index (root, years, months) with a
+    GreaterThanOrEqualTo / LessThan relation pair per child, as create_ldes_files() does.
+    With only= a set of node parts, just those nodes are rewritten and node files of
+    listed parts that are no longer inner nodes are removed. Returns the written file names.
+    """
+    written = []
+    inner = set()
+    uris = {}  # a node's URI is built once, as a parent's child, and reused for its own file
+
+    def node_uri_of(node):
+        uri = uris.get(node.parts)
+        if uri is None:
+            file_name = node_file_name(directory, node)
+            if node.is_leaf():
+                file_name = f"{file_name.rsplit('/', 1)[0]}/{leaf_name}"
+            uri = uris[node.parts] = URIRef(f"{base_uri}{file_name}")
+        return uri
+
+    for node in index.nodes():
+        if node.is_leaf():
+            continue
+        inner.add(node.parts)
+        if only is not None and node.parts not in only:
+            continue
+        temp_graph = create_base_graph()
+        node_uri = node_uri_of(node)
+        for key in sorted(node.children):
+            child = node.children[key]
+            child_uri = node_uri_of(child)
+            temp_graph.add((eventstream_uri, TREE.view, home_page))
+            bn_ge = BNode()
+            bn_lt = BNode()
+            temp_graph.add((node_uri, TREE.relation, bn_ge))
+            temp_graph.add((node_uri, TREE.relation, bn_lt))
+            temp_graph.add((bn_ge, RDF.type, TREE.GreaterThanOrEqualToRelation))
+            temp_graph.add((bn_ge, TREE.node, child_uri))
+            temp_graph.add((bn_ge, TREE.path, tree_path))
+            temp_graph.add((bn_ge, TREE.value, Literal(child.start(), datatype=XSD.dateTime)))
+            temp_graph.add((bn_lt, RDF.type, TREE.LessThanRelation))
+            temp_graph.add((bn_lt, TREE.node, child_uri))
+            temp_graph.add((bn_lt, TREE.path, tree_path))
+            temp_graph.add((bn_lt, TREE.value, Literal(child.end(), datatype=XSD.dateTime)))
+
+        file_name = node_file_name(directory, node)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, "w") as file:
+            file.write(temp_graph.serialize(format="trig"))
+        if log:
+            log(" Writing to file: %s (%d members) \n", file_name, node.count)
+        written.append(file_name)
+
+    for parts in set(only or ()) - inner:
+        file_name = node_file_name(directory, TreeNode(tuple(parts)))
+        if os.path.exists(file_name):
+            os.remove(file_name)
+            try:
+                os.removedirs(os.path.dirname(file_name))
+            except OSError:
+                pass
+    return written
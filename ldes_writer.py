@@ -0,0 +1,227 @@
+import re
+from datetime import datetime
+
+from rdflib import BNode, Literal
+
+from ldes_table import ns_to_datetime
+
+# Template based fragment writer.
+# Member triples are formatted straight from the extracted records into a buffered file,
+# skipping the rdflib Dataset insert + serialize round trip. The output is TriG (or N-Quads)
+# describing the same quads as the Dataset the scripts used to serialize.
+
+PREFIXES = {
+    "sosa": "http://www.w3.org/ns/sosa/",
+    "ex": "http://example.org/",
+    "tss": "https://w3id.org/tss#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "ldes": "https://w3id.org/ldes#",
+    "tree": "https://w3id.org/tree#",
+    "as": "https://www.w3.org/ns/activitystreams#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+}
+PROLOGUE = "".join(f"@prefix {prefix}: <{iri}> .\n" for prefix, iri in PREFIXES.items()) + "\n"
+
+WRITE_BUFFER = 1 << 20
+_LOCAL_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_\-]*\Z")
+_STRING_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r"})
+
+XSD_NS = PREFIXES["xsd"]
+RDF_TYPE = PREFIXES["rdf"] + "type"
+
+
+class TermFormatter:
+    """Formats terms for one output syntax, caching everything that repeats (IRIs, properties)."""
+
+    def __init__(self, format="trig"):
+        self.format = format
+        self.compact = format == "trig"
+        self.iri_cache = {}
+        self.literal_cache = {}
+
+    def iri(self, iri):
+        text = self.iri_cache.get(iri)
+        if text is None:
+            text = f"<{iri}>"
+            if self.compact:
+                if iri == RDF_TYPE:
+                    text = "a"
+                else:
+                    for prefix, namespace in PREFIXES.items():
+                        if iri.startswith(namespace) and _LOCAL_NAME.match(iri, len(namespace)):
+                            text = f"{prefix}:{iri[len(namespace):]}"
+                            break
+            self.iri_cache[iri] = text
+        return text
+
+    def predicate(self, iri):
+        return self.iri(iri)
+
+    def term(self, term):
+        """Any rdflib term (or plain string IRI)."""
+        if isinstance(term, BNode):
+            return f"_:{term}"
+        if isinstance(term, Literal):
+            return self.literal(str(term), term.datatype, term.language)
+        return self.iri(str(term))
+
+    def literal(self, lexical, datatype=None, lang=None):
+        text = f'"{lexical.translate(_STRING_ESCAPES)}"'
+        if lang:
+            return f"{text}@{lang}"
+        if datatype:
+            return f"{text}^^{self.iri(str(datatype))}"
+        return text
+
+    def cached_literal(self, value):
+        """Plain literal for values that repeat a lot, e.g. observed properties."""
+        text = self.literal_cache.get(value)
+        if text is None:
+            text = self.literal_cache[value] = self.term(Literal(value))
+        return text
+
+    def typed(self, lexical, datatype):
+        return f'"{lexical}"^^{self.iri(XSD_NS + datatype)}'
+
+
+def format_float(value):
+    """Same lexical form rdflib gives Literal(value, datatype=XSD.float)."""
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "INF" if value > 0 else "-INF"
+    return repr(value)
+
+
+def format_datetime(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+class QuadWriter:
+    """Writes quads grouped by graph, either as TriG blocks or as N-Quads lines."""
+
+    def __init__(self, file, formatter):
+        self.file = file
+        self.fmt = formatter
+        self.trig = formatter.format == "trig"
+        if self.trig:
+            file.write(PROLOGUE)
+
+    def graph(self, graph, subject, predicate_objects):
+        """One subject with its (predicate, object) pairs; graph=None is the default graph."""
+        if self.trig:
+            if graph is None:
+                head, separator, tail = f"{subject} ", " ;\n    ", " .\n\n"
+            else:
+                head, separator, tail = f"{graph} {{\n    {subject} ", " ;\n        ", " .\n}\n\n"
+            self.file.write(head + separator.join(f"{p} {o}" for p, o in predicate_objects) + tail)
+        else:
+            suffix = f" {graph} .\n" if graph is not None else " .\n"
+            self.file.write("".join(f"{subject} {p} {o}{suffix}" for p, o in predicate_objects))
+
+
+def open_fragment(file_path):
+    return open(file_path, "w", encoding="utf-8", buffering=WRITE_BUFFER)
+
+
+def write_snippet_fragment(file_path, rows, eventstream_uri, home_page, format="trig"):
+    """
+    Write one day of TSS snippets, matching RDF2LDES_YMD_SPARQL_FOR_TSS_V3.divide_data():
+    each snippet and its point template in a named graph, tree:member links in the default graph.
+    """
+    fmt = TermFormatter(format)
+    p = fmt.predicate
+    a = p(RDF_TYPE)
+    tss = PREFIXES["tss"]
+    sosa = PREFIXES["sosa"]
+    tss_from, tss_to, tss_about = p(tss + "from"), p(tss + "to"), p(tss + "about")
+    point_type, points = p(tss + "pointType"), p(tss + "points")
+    made_by, observed_property = p(sosa + "madeBySensor"), p(sosa + "observedProperty")
+    snippet_type, template_type = fmt.iri(tss + "Snippet"), fmt.iri(tss + "PointTemplate")
+    tree_member = p(PREFIXES["tree"] + "member")
+    eventstream = fmt.term(eventstream_uri)
+    term_cache = {}
+
+    def cached(term):
+        text = term_cache.get(term)
+        if text is None:
+            text = term_cache[term] = fmt.term(term)
+        return text
+
+    with open_fragment(file_path) as file:
+        out = QuadWriter(file, fmt)
+        members = [
+            (a, fmt.iri(PREFIXES["ldes"] + "EventStream")),
+            (p(PREFIXES["ldes"] + "timestampPath"), fmt.iri(tss + "from")),
+            (p(PREFIXES["tree"] + "view"), fmt.term(home_page)),
+        ]
+        member_times = []
+        for row in rows:
+            snippet = fmt.term(row["snippet"])
+            template = cached(row["template"])
+            from_time = fmt.typed(format_datetime(row["fromTime"].toPython()), "dateTime")
+            out.graph(snippet, snippet, [
+                (a, snippet_type),
+                (tss_about, template),
+                (tss_from, from_time),
+                (tss_to, fmt.typed(format_datetime(row["toTime"].toPython()), "dateTime")),
+                (point_type, cached(Literal(row["pointType"]))),
+                (points, fmt.term(Literal(row["pointsJson"]))),
+            ])
+            out.graph(snippet, template, [
+                (a, template_type),
+                (made_by, cached(row["sensor"])),
+                (observed_property, cached(row["observedProperty"])),
+            ])
+            members.append((tree_member, snippet))
+            member_times.append((snippet, from_time))
+        out.graph(None, eventstream, members)
+        for snippet, from_time in member_times:
+            out.graph(None, snippet, [(tss_from, from_time)])
+
+
+def write_observation_table(file_path, table, rows, eventstream_uri, home_page, format="trig"):
+    """
+    Write some ObservationTable rows as one day of SOSA observations, matching
+    RDF2LDES_V2.divide_data(): event stream metadata in the default graph and one named graph
+    per observation id. The writer works on the dictionary codes: every property is formatted
+    once per fragment, subjects and values are only decoded here.
+    """
+    fmt = TermFormatter(format)
+    p = fmt.predicate
+    a, ex_id = p(RDF_TYPE), p(PREFIXES["ex"] + "id")
+    has_result = p(PREFIXES["sosa"] + "hasSimpleResult")
+    observed_property = p(PREFIXES["sosa"] + "observedProperty")
+    result_time = p(PREFIXES["sosa"] + "resultTime")
+    observation = fmt.iri(PREFIXES["sosa"] + "Observation")
+    eventstream = fmt.term(eventstream_uri)
+    graph_base = f"{eventstream_uri}/"
+    int_type, float_type, datetime_type = (fmt.iri(XSD_NS + name) for name in ("int", "float", "dateTime"))
+    part = table.take(rows)
+    properties = {code: fmt.cached_literal(table.property_terms[code]) for code in set(part.properties.tolist())}
+    subject_terms, lexical_terms = table.subject_terms, table.lexical_terms
+
+    with open_fragment(file_path) as file:
+        out = QuadWriter(file, fmt)
+        out.graph(None, eventstream, [
+            (a, fmt.iri(PREFIXES["ldes"] + "EventStream")),
+            (p(PREFIXES["ldes"] + "timestampPath"), fmt.iri(PREFIXES["sosa"] + "resultTime")),
+            (p(PREFIXES["tree"] + "view"), fmt.term(home_page)),
+        ])
+        for subject, id_, result_value, property_, time_, offset, lexical in zip(
+                part.subjects.tolist(), part.ids.tolist(), part.results.tolist(),
+                part.properties.tolist(), part.times.tolist(), part.offsets.tolist(), part.lexical.tolist()):
+            if lexical < 0:
+                id_text, result_text = f'"{id_}"^^{int_type}', f'"{format_float(result_value)}"^^{float_type}'
+            else:
+                id_, result_value = lexical_terms[lexical]
+                id_text = fmt.literal(str(id_), XSD_NS + "int")
+                result_text = (f'"{format_float(result_value)}"^^{float_type}' if isinstance(result_value, float)
+                               else fmt.literal(result_value, XSD_NS + "float"))
+            out.graph(f"<{graph_base}{id_}>", fmt.term(subject_terms[subject]), [
+                (a, observation),
+                (ex_id, id_text),
+                (has_result, result_text),
+                (observed_property, properties[property_]),
+                (result_time, f'"{ns_to_datetime(time_, offset).isoformat()}"^^{datetime_type}'),
+            ])
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import RDF2LDES_V2
+from ldes_state import CheckpointJournal
+from ldes_synthetic import write_observations
+
+OBSERVATION = "<http://www.w3.org/ns/sosa/Observation>"
+
+
+class Crash(Exception):
+    pass
+
+
+def split_source(path, first_path, rest_path, members):
+    """Write the first members observations of a synthetic source to first_path and the others to rest_path."""
+    with open(path, "r", encoding="utf-8") as file:
+        prefixes, body = file.read().split("\n\n", 1)
+    records = [record for record in body.split("\n\n") if record.strip()]
+    for part_path, part in ((first_path, records[:members]), (rest_path, records[members:])):
+        with open(part_path, "w", encoding="utf-8") as file:
+            file.write(prefixes + "\n\n" + "\n\n".join(part) + "\n")
+
+
+class AppendOnlyResumeTest(unittest.TestCase):
+    """A run killed between appending a day's fragment and committing it must not duplicate members on resume."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(self.directory)
+        # 4 days of 96 observations; the first part ends in the middle of day 2
+        write_observations("all.ttl", days=4, sensors=2, properties=2, readings=24)
+        split_source("all.ttl", "first.ttl", "rest.ttl", 96 + 48)
+
+    def run_script(self, input_path, output):
+        with mock.patch.multiple(RDF2LDES_V2, input_path=input_path, base_path=output, directory=output + "/",
+                                 append_only=True, incremental=False, fast_writer=True, output_format="nquads",
+                                 stream_input=True, workers=1, max_members=None, log_level="quiet"):
+            RDF2LDES_V2.main()
+
+    def member_counts(self, output):
+        counts = {}
+        for root, _, files in os.walk(output):
+            for name in files:
+                if name == "readings.ttl":
+                    with open(os.path.join(root, name), "r", encoding="utf-8") as file:
+                        counts[os.path.relpath(root, output)] = sum(OBSERVATION in line for line in file)
+        return counts
+
+    def run_with_crash(self, input_path, output, crash_at):
+        """Run, failing right after the fragments of the crash_at-th bucket were appended (before its commit)."""
+        commit_bucket = CheckpointJournal.commit_bucket
+        calls = []
+
+        def crashing_commit(journal, parts, pages):
+            calls.append(parts)
+            if len(calls) == crash_at:
+                raise Crash()
+            return commit_bucket(journal, parts, pages)
+
+        with mock.patch.object(CheckpointJournal, "commit_bucket", crashing_commit):
+            with self.assertRaises(Crash):
+                self.run_script(input_path, output)
+
+    def test_resume_after_crash_in_new_bucket(self):
+        self.run_script("all.ttl", "CLEAN")
+        self.run_with_crash("all.ttl", "OUT", crash_at=3)
+        self.run_script("all.ttl", "OUT")
+        self.assertEqual(self.member_counts("OUT"), {"2020/11/01": 96, "2020/11/02": 96, "2020/11/03": 96, "2020/11/04": 96})
+        self.assertEqual(self.member_counts("OUT"), self.member_counts("CLEAN"))
+
+    def test_resume_after_crash_in_existing_bucket(self):
+        self.run_script("first.ttl", "OUT")
+        self.assertEqual(self.member_counts("OUT"), {"2020/11/01": 96, "2020/11/02": 48})
+        # the first bucket of the second run appends the rest of day 2 to its existing fragment
+        self.run_with_crash("all.ttl", "OUT", crash_at=1)
+        self.run_script("all.ttl", "OUT")
+        self.assertEqual(self.member_counts("OUT"), {"2020/11/01": 96, "2020/11/02": 96, "2020/11/03": 96, "2020/11/04": 96})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from rdflib import BNode, URIRef
+
+import RDF2LDES_V2
+import ldes_cache
+from ldes_cache import MappedTerms, SnapshotCache
+from ldes_synthetic import write_observations
+
+
+class SnapshotCacheTest(unittest.TestCase):
+    """A snapshot is used for an unchanged source and dropped when the source changes."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "source.ttl")
+        write_observations(self.path, days=2, sensors=2, properties=2, readings=6)
+        self.expected = sorted(RDF2LDES_V2.read_table(self.path, cache=True).records())
+
+    def read_cached(self):
+        """The table read with the cache and whether the source had to be parsed again."""
+        with mock.patch.object(RDF2LDES_V2, "load_graph", wraps=RDF2LDES_V2.load_graph) as load_graph:
+            table = RDF2LDES_V2.read_table(self.path, cache=True)
+        return table, load_graph.called
+
+    def age_snapshot(self):
+        """Move the source's mtime out of the racy window, so matching size and mtime are trusted."""
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 2 * ldes_cache.RACY_NS))
+        self.read_cached()  # mtime changed, content did not: the hash matches and the snapshot is kept
+
+    def test_hit(self):
+        self.age_snapshot()
+        with mock.patch.object(ldes_cache, "file_digest", side_effect=AssertionError("source was hashed")):
+            table, parsed = self.read_cached()
+        self.assertFalse(parsed)
+        self.assertIsInstance(table.subject_terms, MappedTerms)
+        self.assertEqual(sorted(table.records()), self.expected)
+
+    def test_touched_source_is_hashed(self):
+        os.utime(self.path)
+        table, parsed = self.read_cached()
+        self.assertFalse(parsed)
+        self.assertEqual(sorted(table.records()), self.expected)
+
+    def test_size_change(self):
+        self.age_snapshot()
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("\n")
+        _, parsed = self.read_cached()
+        self.assertTrue(parsed)
+
+    def test_content_change(self):
+        # same size and mtime (an edit in the same mtime tick), right after the snapshot: only the hash can tell
+        stat = os.stat(self.path)
+        with open(self.path, "r+b") as file:
+            data = file.read()
+            file.seek(0)
+            file.write(data.replace(b'ex:id "0"', b'ex:id "9"', 1))
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        table, parsed = self.read_cached()
+        self.assertTrue(parsed)
+        self.assertNotEqual(sorted(table.records()), self.expected)
+
+    def test_mapped_terms(self):
+        terms = [URIRef("https://example.org/observation/é"), BNode("b1"), URIRef("")]
+        text, offsets = MappedTerms.columns(terms)
+        mapped = MappedTerms(text, offsets)
+        self.assertEqual(len(mapped), 3)
+        self.assertEqual(list(mapped), terms)
+        self.assertEqual(mapped[1], BNode("b1"))
+
+    def test_snippet_rows(self):
+        cache = SnapshotCache(self.path, "snippets")
+        rows = [{"a": URIRef("https://example.org/x"), "b": BNode("n")}, {"a": URIRef("https://example.org/y"), "b": None}]
+        self.assertIsNone(cache.load_rows())
+        cache.save_rows(rows, ("a", "b"))
+        self.assertEqual(cache.load_rows(), rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
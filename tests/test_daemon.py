@@ -0,0 +1,122 @@
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+
+from rdflib import BNode, Dataset
+from rdflib.compare import isomorphic
+
+import RDF2LDES_V2
+from ldes_daemon import WarmState, listening, send, serve
+from ldes_pipeline import Pipeline
+from ldes_synthetic import write_observations
+
+BASE_URI = "https://example.org/"
+MIRROR_URI = "https://mirror.example.org/ldes/"
+
+
+def output_graphs(output):
+    """{(relative path, graph name): Graph} of the fragments and tree nodes under output (state files left out)."""
+    graphs = {}
+    for root, _, names in os.walk(output):
+        for name in names:
+            if not name.startswith("."):
+                dataset = Dataset()
+                dataset.parse(os.path.join(root, name), format="trig")
+                relative = os.path.relpath(os.path.join(root, name), output)
+                for graph in dataset.graphs():
+                    if len(graph):
+                        graphs[relative, None if isinstance(graph.identifier, BNode) else graph.identifier] = graph
+    return graphs
+
+
+class DaemonTest(unittest.TestCase):
+    """Commands sent over the socket change the LDES like a clean run over the same sources would."""
+
+    def setUp(self):
+        saved = dict(vars(RDF2LDES_V2))
+        self.addCleanup(vars(RDF2LDES_V2).update, saved)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(directory.name)
+        write_observations("first.ttl", days=2, sensors=2, properties=1, readings=6)
+        # later days, so an append adds fragments
+        write_observations("second.ttl", days=1, sensors=2, properties=1, readings=6, seed=1,
+                           start=datetime(2020, 11, 5, tzinfo=timezone.utc))
+
+        self.warm = WarmState(Pipeline("sosa", base_uri=BASE_URI, log_level="quiet"), ["first.ttl"], "OUT")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.warm.load()
+            self.server = threading.Thread(target=serve, args=(self.warm, "ldes.sock"))
+            self.server.start()
+            deadline = time.monotonic() + 10
+            while not listening("ldes.sock"):
+                self.assertLess(time.monotonic(), deadline, "the daemon did not start listening")
+                time.sleep(0.01)
+        self.addCleanup(self.stop)
+
+    def stop(self):
+        if self.server.is_alive():
+            send("stop", "ldes.sock")
+            self.server.join(10)
+
+    def clean_run(self, inputs, base_uri):
+        """Output graphs of a clean run over inputs, written to OUT in its own directory (OUT is part of the URIs)."""
+        directory = f"clean{len(os.listdir('.'))}"
+        os.makedirs(directory)
+        os.chdir(directory)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                Pipeline("sosa", base_uri=base_uri, log_level="quiet").run([os.path.join("..", path) for path in inputs], "OUT")
+            return output_graphs("OUT")
+        finally:
+            os.chdir("..")
+
+    def assert_same_ldes(self, expected):
+        written = output_graphs("OUT")
+        self.assertEqual(sorted(written, key=str), sorted(expected, key=str))
+        for key, graph in written.items():
+            self.assertTrue(isomorphic(graph, expected[key]), key)
+
+    def test_status(self):
+        reply = send("status", "ldes.sock")
+        self.assertTrue(reply["ok"])
+        self.assertEqual((reply["members"], reply["inputs"], reply["base_uri"]), (24, ["first.ttl"], BASE_URI))
+        self.assertEqual(reply["fragments"], 2)  # one per day
+        self.assert_same_ldes(self.clean_run(["first.ttl"], BASE_URI))
+
+    def test_append_and_emit(self):
+        reply = send("append second.ttl", "ldes.sock")
+        self.assertTrue(reply["ok"], reply)
+        self.assertEqual((reply["members"], reply["fragments"]), (36, 3))
+        self.assertEqual(reply["inputs"], ["first.ttl", "second.ttl"])
+        self.assert_same_ldes(self.clean_run(["first.ttl", "second.ttl"], BASE_URI))
+
+        reply = send(f"emit {MIRROR_URI}", "ldes.sock")
+        self.assertTrue(reply["ok"], reply)
+        self.assertEqual((reply["members"], reply["base_uri"]), (36, MIRROR_URI))
+        self.assert_same_ldes(self.clean_run(["first.ttl", "second.ttl"], MIRROR_URI))
+
+    def test_errors_keep_the_daemon_serving(self):
+        for line in ("compact", "append", "append missing.ttl"):
+            with self.subTest(line):
+                reply = send(line, "ldes.sock")
+                self.assertFalse(reply["ok"])
+                self.assertIn("error", reply)
+        self.assertEqual(send("status", "ldes.sock")["members"], 24)
+
+    def test_stop(self):
+        self.assertEqual(send("stop", "ldes.sock"), {"ok": True, "command": "stop"})
+        self.server.join(10)
+        self.assertFalse(self.server.is_alive())
+        self.assertFalse(os.path.exists("ldes.sock"))
+
+
+if __name__ == "__main__":
+    unittest.main()
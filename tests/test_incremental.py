@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from rdflib import BNode, Dataset
+from rdflib.compare import isomorphic
+
+import RDF2LDES_V2
+from ldes_synthetic import write_observations
+
+
+def output_graphs(output):
+    """{(relative path, graph name): Graph} of the fragments and tree nodes under output (the state file left out)."""
+    graphs = {}
+    for root, _, names in os.walk(output):
+        for name in names:
+            if not name.startswith("."):
+                dataset = Dataset()
+                dataset.parse(os.path.join(root, name), format="trig")
+                relative = os.path.relpath(os.path.join(root, name), output)
+                for graph in dataset.graphs():
+                    if len(graph):
+                        graphs[relative, None if isinstance(graph.identifier, BNode) else graph.identifier] = graph
+    return graphs
+
+
+class SettingsChangeTest(unittest.TestCase):
+    """An incremental run with other fragmentation settings must write the same tree as a clean run."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(directory.name)
+        os.makedirs("clean")
+        write_observations("source.ttl", days=2, sensors=2, properties=2, readings=24)
+
+    def run_script(self, output, source="source.ttl", **settings):
+        settings = {"max_members": None, "levels": ("year", "month", "day"), "target_members": None, **settings}
+        with mock.patch.multiple(RDF2LDES_V2, input_path=source, base_path=output, directory=output + "/",
+                                 base_uri="https://example.org/", incremental=True, append_only=False,
+                                 fast_writer=True, workers=1, log_level="quiet", **settings):
+            RDF2LDES_V2.main()
+
+    def assert_rewritten(self, before, after):
+        self.run_script("OUT", **before)
+        self.run_script("OUT", **after)
+        os.chdir("clean")  # same output path, so the same URIs
+        self.run_script("OUT", source="../source.ttl", **after)
+        os.chdir("..")
+        written, clean = output_graphs("OUT"), output_graphs("clean/OUT")
+        self.assertEqual(sorted(written), sorted(clean))
+        for key in written:
+            self.assertTrue(isomorphic(written[key], clean[key]), key)
+
+    def test_max_members(self):
+        self.assert_rewritten({}, {"max_members": 40})
+
+    def test_levels(self):
+        self.assert_rewritten({}, {"levels": ("year", "month")})
+
+    def test_target_members(self):
+        self.assert_rewritten({"levels": ("year", "month", "day", "hour")},
+                              {"levels": ("year", "month", "day", "hour"), "target_members": (10, 50)})
+
+
+if __name__ == "__main__":
+    unittest.main()
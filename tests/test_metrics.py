@@ -0,0 +1,28 @@
+import unittest
+
+from ldes_memory import current_rss
+from ldes_metrics import RunMetrics, peak_rss
+
+
+@unittest.skipIf(peak_rss() is None or current_rss() is None, "needs resource and a way to read the RSS")
+class StageRssTest(unittest.TestCase):
+    """A stage's peak_rss is the memory it used while running, not what it kept when it was left."""
+
+    def test_peak_and_exit_rss(self):
+        metrics = RunMetrics()
+        size = peak_rss() - current_rss() + 64 * 2**20  # past the process's high-water mark
+        with metrics.stage("allocate"):
+            block = bytearray(size)
+            block[::4096] = b"x" * len(block[::4096])  # touch every page
+            del block
+        with metrics.stage("idle"):
+            pass
+        allocate, idle = metrics.stages["allocate"], metrics.stages["idle"]
+        self.assertGreaterEqual(allocate.peak_rss, allocate.exit_rss + 32 * 2**20)
+        self.assertIsNone(idle.peak_rss)
+        self.assertIsNotNone(idle.exit_rss)
+        self.assertEqual(metrics.to_json()["stages"]["allocate"]["peak_rss"], allocate.peak_rss)
+
+
+if __name__ == "__main__":
+    unittest.main()
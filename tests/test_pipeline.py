@@ -0,0 +1,83 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import RDF2LDES_V2
+from ldes_pipeline import RUN_FILE, Pipeline, main, output_path
+from ldes_synthetic import write_observations
+
+
+class ConfigureTest(unittest.TestCase):
+    """A run only gets the options its own pipeline sets, whatever earlier runs in the process set."""
+
+    def setUp(self):
+        saved = dict(vars(RDF2LDES_V2))
+        self.addCleanup(vars(RDF2LDES_V2).update, saved)
+
+    def test_options_reset_to_script_defaults(self):
+        max_members, incremental, levels = RDF2LDES_V2.max_members, RDF2LDES_V2.incremental, RDF2LDES_V2.levels
+        script = Pipeline("sosa", max_members=5, incremental=True, levels=("year", "month")).configure("source.ttl", "OUT")
+        self.assertEqual((script.max_members, script.incremental, script.levels), (5, True, ("year", "month")))
+        script = Pipeline("sosa").configure("source.ttl", "OUT")
+        self.assertEqual((script.max_members, script.incremental, script.levels), (max_members, incremental, levels))
+
+    def test_bad_engine_is_a_usage_error(self):
+        for option in (["--engine", "sparql"], ["--writer", "fast", "--shape", "sosa", "--engine", "nope"]):
+            with contextlib.redirect_stderr(io.StringIO()) as stderr, self.assertRaises(SystemExit) as exit:
+                main(["source.ttl", "--output", "OUT"] + option)
+            self.assertEqual(exit.exception.code, 2)
+            self.assertIn("does not extract sosa members", stderr.getvalue())
+
+    def test_bad_log_level_is_a_usage_error(self):
+        with contextlib.redirect_stderr(io.StringIO()) as stderr, self.assertRaises(SystemExit) as exit:
+            main(["source.ttl", "--output", "OUT", "--log-level", "verbose"])
+        self.assertEqual(exit.exception.code, 2)
+        self.assertIn("invalid choice: 'verbose'", stderr.getvalue())
+
+
+class RunFileTest(unittest.TestCase):
+    """The stamp of an incremental run is written next to the fragments it describes."""
+
+    def setUp(self):
+        saved = dict(vars(RDF2LDES_V2))
+        self.addCleanup(vars(RDF2LDES_V2).update, saved)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(directory.name)
+        write_observations("source.ttl", days=1, sensors=1, properties=1, readings=4)
+
+    def test_run_file_in_output_directory(self):
+        pipeline = Pipeline("sosa", incremental=True, log_level="quiet")
+        self.assertIsNotNone(pipeline.run("source.ttl", "./OUT/"))
+        self.assertTrue(os.path.exists(os.path.join("OUT", RUN_FILE)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(pipeline.run("source.ttl", "OUT"))  # up to date
+
+    def test_absolute_output_is_refused(self):
+        with self.assertRaisesRegex(ValueError, "below the current one"):
+            Pipeline("sosa").run("source.ttl", os.path.abspath("OUT"))
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit) as exit:
+            main(["source.ttl", "--output", os.path.abspath("OUT")])
+        self.assertEqual(exit.exception.code, 2)
+        self.assertFalse(os.path.exists("OUT"))
+
+
+class OutputPathTest(unittest.TestCase):
+    def test_normalised_once_for_paths_and_uris(self):
+        self.assertEqual(output_path("./site//LDES/"), "site/LDES")
+        settings = Pipeline("sosa", base_uri="https://example.org/").settings("source.ttl", "./site//LDES/")
+        self.assertEqual((settings["base_path"], settings["directory"]), ("site/LDES", "site/LDES/"))
+        self.assertEqual(settings["home_page"], "https://example.org/site/LDES/LDES.trig")
+
+    def test_outside_the_site_root(self):
+        for output in ("/srv/LDES", "../LDES", ".", "LDES/../.."):
+            with self.subTest(output), self.assertRaises(ValueError):
+                output_path(output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from rdflib import BNode, Dataset
+from rdflib.compare import isomorphic
+
+import RDF2LDES_V2
+from ldes_synthetic import write_observations
+
+
+def output_graphs(output):
+    """{(relative path, graph name): Graph} of every file under output (blank node labels differ between runs)."""
+    graphs = {}
+    for root, _, names in os.walk(output):
+        for name in names:
+            dataset = Dataset()
+            dataset.parse(os.path.join(root, name), format="trig")
+            relative = os.path.relpath(os.path.join(root, name), output)
+            for graph in dataset.graphs():
+                if len(graph):
+                    graphs[relative, None if isinstance(graph.identifier, BNode) else graph.identifier] = graph
+    return graphs
+
+
+class OutOfCoreTest(unittest.TestCase):
+    """Runs that spill rows to run files write the same files and graphs as an in-memory run."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(directory.name)
+        os.makedirs("sources")
+        # two months, so a spilled run is written one month at a time
+        write_observations("sources/october.ttl", days=3, sensors=2, properties=2, readings=12,
+                           start=datetime(2020, 10, 30, tzinfo=timezone.utc))
+        write_observations("sources/november.ttl", days=2, sensors=2, properties=2, readings=12, seed=1)
+
+    def run_script(self, source, **settings):
+        output = f"run{len(os.listdir('.'))}"
+        os.makedirs(output)
+        os.chdir(output)  # same output path, so the same URIs
+        try:
+            with mock.patch.multiple(RDF2LDES_V2, input_path=os.path.join("..", source), base_path="OUT",
+                                     directory="OUT/", workers=1, ingest_workers=1, incremental=False,
+                                     append_only=False, log_level="quiet", **settings):
+                RDF2LDES_V2.main()
+            return output_graphs("OUT")
+        finally:
+            os.chdir("..")
+
+    def assert_same_output(self, source, **settings):
+        expected = self.run_script(source, **settings)
+        self.assertTrue(expected)
+        runs = {
+            "out of core": dict(out_of_core=True),
+            "out of core, streamed": dict(out_of_core=True, stream_input=True, spill_budget=2**12),
+            "memory budget": dict(max_memory=2**20),  # below the interpreter's own footprint: everything spills
+        }
+        for name, spill_settings in runs.items():
+            with self.subTest(name, **settings):
+                spilled = self.run_script(source, **spill_settings, **settings)
+                self.assertEqual(sorted(spilled, key=str), sorted(expected, key=str))
+                for key, graph in spilled.items():
+                    self.assertTrue(isomorphic(graph, expected[key]), key)
+
+    def test_one_source(self):
+        self.assert_same_output("sources/november.ttl")
+
+    def test_several_sources(self):
+        self.assert_same_output("sources")
+
+    def test_fragment_levels(self):
+        self.assert_same_output("sources", levels=("year", "month"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import io
+import os
+import tempfile
+import unittest
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.compare import isomorphic
+
+import RDF2LDES_V2
+from ldes_stream import _TripleReader, stream_observations, stream_triples, tokenize
+from ldes_synthetic import write_observations
+
+BASE = "https://example.org/"
+
+PREFIXES = """@prefix ex: <http://example.org/> .
+PREFIX sosa: <http://www.w3.org/ns/sosa/>
+@prefix : <http://example.org/default#> .
+@base <http://example.org/data/> .
+<a> ex:p <b> , <../c> , ex:d .
+:e a sosa:Observation ; sosa:observedProperty ex:prop\\.1 .
+BASE <http://example.org/other/>
+<f> ex:p ex: .
+"""
+
+STRINGS = r"""@prefix ex: <http://example.org/> .
+ex:s ex:quote "say \"hi\"" ; ex:escapes "tab\tnew\nline\\ é \U0001F600" ;
+    ex:single 'it\'s' ; ex:lang "chat"@fr ; ex:lang "colour"@en-GB ;
+    ex:typed "1.5"^^<http://www.w3.org/2001/XMLSchema#float> ;
+""" + '''    ex:long """first line
+second "quoted" line ""inner"" end\\"""" ;
+    ex:longsingle ''' + r"""'''it's
+long''' ;
+    ex:numbers 1 , -2.5 , 3e4 , +7 ; ex:flag true , false .
+"""
+
+BLANKS = """@prefix ex: <http://example.org/> .
+_:b1 ex:knows _:b2 ; ex:name "one" .
+_:b2 ex:knows _:b1 .
+ex:s ex:template [ ex:sensor ex:sensor1 ; ex:property "p" , "q" ; ] ;
+     ex:nested [ ex:inner [ ex:deep 1 ] ] ;;
+     ex:empty [] .
+[ ex:only "bnode subject" ] .
+[ ex:with "properties" ] ex:after "more" .
+"""
+
+# observation/1 is split around observation/2, which is repeated in full further on
+SCATTERED = """@prefix sosa: <http://www.w3.org/ns/sosa/> .
+@prefix ex: <http://example.org/> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+<observation/1> a sosa:Observation ; ex:id 1 .
+<observation/2> a sosa:Observation ; ex:id 2 ; sosa:hasSimpleResult "2.5"^^xsd:float ;
+    sosa:observedProperty "p" ; sosa:resultTime "2020-11-01T02:00:00Z"^^xsd:dateTime .
+<observation/1> sosa:hasSimpleResult "1.5"^^xsd:float ; sosa:observedProperty "p" .
+<observation/3> a sosa:Observation ; ex:id 3 .
+<observation/1> sosa:resultTime "2020-11-01T01:00:00Z"^^xsd:dateTime .
+<observation/2> a sosa:Observation ; ex:id 2 ; sosa:hasSimpleResult "2.5"^^xsd:float ;
+    sosa:observedProperty "p" ; sosa:resultTime "2020-11-01T02:00:00Z"^^xsd:dateTime .
+"""
+
+SOURCES = {"prefixes and base": PREFIXES, "escaped and long strings": STRINGS, "blank nodes and lists": BLANKS}
+
+
+def to_rdflib(term):
+    """An rdflib term for a streamed term (IRIs are strings, literals (lexical, datatype, language) tuples)."""
+    if isinstance(term, BNode):
+        return term
+    if isinstance(term, tuple):
+        lexical, datatype, lang = term
+        return Literal(lexical, lang=lang, datatype=URIRef(datatype) if datatype else None)
+    return URIRef(term)
+
+
+def streamed_graph(triples):
+    graph = Graph()
+    for triple in triples:
+        graph.add(tuple(map(to_rdflib, triple)))
+    return graph
+
+
+def parse_text(text, chunk_size):
+    return streamed_graph(_TripleReader(tokenize(io.StringIO(text), chunk_size), BASE).triples())
+
+
+class StreamTriplesTest(unittest.TestCase):
+    """The streaming reader gives the same graph as rdflib's Turtle parser."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def assert_same_graph(self, text, streamed):
+        expected = Graph().parse(data=text, format="turtle", publicID=BASE)
+        self.assertEqual(len(streamed), len(expected))
+        self.assertTrue(isomorphic(streamed, expected),
+                        sorted(set(streamed.serialize(format="nt").splitlines())
+                               ^ set(expected.serialize(format="nt").splitlines())))
+
+    def test_matches_rdflib(self):
+        for name, text in SOURCES.items():
+            with self.subTest(name):
+                path = os.path.join(self.directory, "source.ttl")
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write(text)
+                self.assert_same_graph(text, streamed_graph(stream_triples(path, BASE)))
+
+    def test_tokens_split_across_chunks(self):
+        # every chunk size up to 40 characters splits some IRI, string, long string or number
+        for name, text in SOURCES.items():
+            for chunk_size in range(1, 41):
+                with self.subTest(name, chunk_size=chunk_size):
+                    self.assert_same_graph(text, parse_text(text, chunk_size))
+
+    def test_collections_are_refused(self):
+        for text in ("<http://example.org/s> <http://example.org/p> ( 1 2 ) .", "( 1 2 ) <http://example.org/p> 3 ."):
+            with self.subTest(text), self.assertRaisesRegex(ValueError, "collections are not supported"):
+                list(_TripleReader(tokenize(io.StringIO(text)), BASE).triples())
+
+
+class StreamObservationsTest(unittest.TestCase):
+    """stream_observations() yields the observations extract_observations() finds in an rdflib Graph."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "source.ttl")
+
+    def assert_same_observations(self):
+        graph = Graph().parse(self.path, format="turtle", publicID=BASE)
+        streamed = list(stream_observations(self.path, BASE))
+        self.assertEqual(sorted(streamed), sorted(RDF2LDES_V2.extract_observations(graph)))
+        return streamed
+
+    def test_synthetic_source(self):
+        write_observations(self.path, days=2, sensors=2, properties=2, readings=6)
+        self.assertEqual(len(self.assert_same_observations()), 48)
+
+    def test_subjects_need_not_be_contiguous(self):
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(SCATTERED)
+        streamed = self.assert_same_observations()
+        self.assertEqual([str(obs) for obs, *_ in streamed], [BASE + "observation/2", BASE + "observation/1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from rdflib import Dataset, Graph, URIRef
+from rdflib.namespace import XSD
+
+import RDF2LDES_V2
+from ldes_stream import stream_observations
+from ldes_table import ObservationTable
+
+SOURCE = """@prefix sosa: <http://www.w3.org/ns/sosa/> .
+@prefix ex: <http://example.org/> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+<observation/0> a sosa:Observation ; ex:id "0"^^xsd:int ; sosa:hasSimpleResult "1.5"^^xsd:float ;
+    sosa:observedProperty "property0" ; sosa:resultTime "2020-11-01T00:00:00Z"^^xsd:dateTime .
+<observation/1> a sosa:Observation ; ex:id "1"^^xsd:int ; sosa:hasSimpleResult "abc" ;
+    sosa:observedProperty "property0" ; sosa:resultTime "2020-11-01T01:00:00Z"^^xsd:dateTime .
+<observation/2> a sosa:Observation ; ex:id "A-12" ; sosa:hasSimpleResult "2.5"^^xsd:float ;
+    sosa:observedProperty "property0" ; sosa:resultTime "2020-11-01T02:00:00Z"^^xsd:dateTime .
+<observation/3> a sosa:Observation ; ex:id 3000000000 ; sosa:hasSimpleResult "3.5"^^xsd:float ;
+    sosa:observedProperty "property0" ; sosa:resultTime "2020-11-02T00:00:00Z"^^xsd:dateTime .
+"""
+
+# (ex:id, sosa:hasSimpleResult) as lexical form and datatype, as the scripts always wrote them
+EXPECTED = {
+    "observation/0": (("0", XSD.int), ("1.5", XSD.float)),
+    "observation/1": (("1", XSD.int), ("abc", XSD.float)),
+    "observation/2": (("A-12", XSD.int), ("2.5", XSD.float)),
+    "observation/3": (("3000000000", XSD.int), ("3.5", XSD.float)),
+}
+EX_ID = URIRef("http://example.org/id")
+HAS_RESULT = URIRef("http://www.w3.org/ns/sosa/hasSimpleResult")
+
+
+class LexicalValueTest(unittest.TestCase):
+    """Ids and results that do not fit the numeric columns are kept and written as they were read."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(directory.name)
+        with open("source.ttl", "w", encoding="utf-8") as file:
+            file.write(SOURCE)
+        logger = logging.getLogger("rdflib.term")  # reading "abc"^^xsd:float back logs a conversion warning
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.ERROR)
+
+    def extracted(self):
+        graph = Graph().parse("source.ttl", format="turtle", publicID="https://example.org/")
+        return {"stream": list(stream_observations("source.ttl")), "direct": RDF2LDES_V2.extract_observations(graph)}
+
+    def test_records_round_trip(self):
+        for engine, records in self.extracted().items():
+            with self.subTest(engine=engine):
+                table = ObservationTable.from_records(records)
+                self.assertEqual(len(table), 4)
+                self.assertEqual((table.lexical >= 0).sum(), 2)  # 3000000000 fits the int64 ids
+                decoded = {str(obs): (str(id_), str(result)) for obs, id_, result, _, _ in table.records()}
+                self.assertEqual(decoded, {str(obs): (str(id_), str(result)) for obs, id_, result, _, _ in records})
+
+    def test_take_and_concatenate_keep_lexical_values(self):
+        records = self.extracted()["stream"]
+        first, second = ObservationTable.from_records(records[:2]), ObservationTable.from_records(records[2:])
+        table = ObservationTable.concatenate([second, first]).take([3, 0, 1, 2])
+        self.assertEqual([(id_, result) for _, id_, result, _, _ in table.records()],
+                         [(1, "abc"), ("A-12", 2.5), (3000000000, 3.5), (0, 1.5)])
+
+    def written(self, output, format="trig"):
+        values = {}
+        for root, _, names in os.walk(output):
+            if "readings.ttl" in names:
+                dataset = Dataset()
+                dataset.parse(os.path.join(root, "readings.ttl"), format=format)
+                for subject, predicate, value, _ in dataset.quads((None, None, None, None)):
+                    if predicate in (EX_ID, HAS_RESULT):
+                        key = str(subject).rsplit("/", 2)[-2] + "/" + str(subject).rsplit("/", 1)[-1]
+                        values.setdefault(key, {})[predicate] = (str(value), value.datatype)
+        return {key: (pair[EX_ID], pair[HAS_RESULT]) for key, pair in values.items()}
+
+    def test_every_path_writes_lexical_values(self):
+        paths = {"rdflib writer": {"fast_writer": False}, "trig": {}, "nquads": {"output_format": "nquads"},
+                 "direct extract": {"stream_input": False}, "workers": {"workers": 2},
+                 "out of core": {"out_of_core": True}, "snapshot cache": {"snapshot_cache": True}}
+        for name, settings in paths.items():
+            with self.subTest(name):
+                output = name.replace(" ", "_")
+                settings = {"fast_writer": True, "output_format": "trig", "stream_input": True, "workers": 1,
+                            "out_of_core": False, "snapshot_cache": False, **settings}
+                with mock.patch.multiple(RDF2LDES_V2, input_path="source.ttl", base_path=output, directory=output + "/",
+                                         incremental=False, append_only=False, log_level="quiet", **settings):
+                    RDF2LDES_V2.main()
+                    if settings["snapshot_cache"]:
+                        RDF2LDES_V2.main()  # from the snapshot
+                self.assertEqual(self.written(output, settings["output_format"]), EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()
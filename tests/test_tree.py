@@ -0,0 +1,45 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from ldes_table import datetime_to_ns
+from ldes_tree import BucketIndex, ns_to_utc, page_bounds
+
+
+def day_pages(offset, max_members):
+    """Pages of one calendar day (2020-11-01 on a clock offset hours from UTC) with a reading every 15 minutes."""
+    zone = timezone(timedelta(hours=offset))
+    times = np.array([datetime_to_ns(datetime(2020, 11, 1, tzinfo=zone) + timedelta(minutes=15 * i)) for i in range(96)])
+    return [(end - start, int(times[start]), int(times[end - 1])) for start, end in page_bounds(times, max_members)]
+
+
+class PageBoundsTest(unittest.TestCase):
+    """Every member of a page lies within the page's GreaterThanOrEqualTo / LessThan bounds."""
+
+    def assert_pages_cover_members(self, offset):
+        pages = day_pages(offset, 40)
+        node = BucketIndex().add_bucket((2020, 11, 1), 96, pages[0][1], pages[-1][2], pages)
+        self.assertEqual(len(node.children), 3)
+        for page, (_, page_min, page_max) in enumerate(pages):
+            child = node.children[page]
+            self.assertLessEqual(child.start(), ns_to_utc(page_min))
+            self.assertLess(ns_to_utc(page_max), child.end())
+            if page:
+                self.assertEqual(child.start(), node.children[page - 1].end())
+
+    def test_utc(self):
+        self.assert_pages_cover_members(0)
+        node = BucketIndex().add_bucket((2020, 11, 1), 96, 0, 0, day_pages(0, 40))
+        self.assertEqual(node.children[0].start(), node.start())
+        self.assertEqual(node.children[2].end(), node.end())
+
+    def test_ahead_of_utc(self):
+        self.assert_pages_cover_members(2)
+
+    def test_behind_utc(self):
+        self.assert_pages_cover_members(-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
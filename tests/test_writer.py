@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from rdflib import BNode, Dataset
+from rdflib.compare import isomorphic
+
+import RDF2LDES_V2
+import RDF2LDES_YMD_SPARQL_FOR_TSS_V3
+from ldes_synthetic import write_observations, write_snippets
+
+
+def fragment_graphs(output, format):
+    """{(fragment path, graph name): Graph} of the day fragments under output."""
+    graphs = {}
+    for root, _, names in os.walk(output):
+        for name in names:
+            if name.startswith("readings."):
+                dataset = Dataset()
+                dataset.parse(os.path.join(root, name), format=format)
+                for graph in dataset.graphs():
+                    if len(graph):
+                        key = os.path.relpath(root, output), None if isinstance(graph.identifier, BNode) else graph.identifier
+                        graphs[key] = graph
+    return graphs
+
+
+class TemplateWriterTest(unittest.TestCase):
+    """The template writer's TriG and N-Quads hold the quads of the rdflib Dataset the scripts serialize."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(directory.name)
+
+    def run_script(self, script, source, output, **settings):
+        with mock.patch.multiple(script, input_path=source, base_path=output, directory=output + "/", workers=1,
+                                 incremental=False, append_only=False, log_level="quiet", **settings):
+            script.main()
+
+    def assert_same_quads(self, script, source):
+        self.run_script(script, source, "OUT", fast_writer=False)
+        expected = fragment_graphs("OUT", "trig")
+        self.assertTrue(expected)
+        for format in ("trig", "nquads"):
+            with self.subTest(format):
+                os.makedirs(format)
+                os.chdir(format)  # same output path, so the same URIs
+                self.run_script(script, os.path.join("..", source), "OUT", fast_writer=True, output_format=format)
+                written = fragment_graphs("OUT", format)
+                os.chdir("..")
+                self.assertEqual(sorted(written, key=str), sorted(expected, key=str))
+                for key, graph in written.items():
+                    self.assertTrue(isomorphic(graph, expected[key]), key)
+
+    def test_observations(self):
+        write_observations("source.ttl", days=2, sensors=2, properties=2, readings=6)
+        self.assert_same_quads(RDF2LDES_V2, "source.ttl")
+
+    def test_snippets(self):
+        write_snippets("source.ttl", days=2, sensors=2, properties=2, readings=3, points=4)
+        self.assert_same_quads(RDF2LDES_YMD_SPARQL_FOR_TSS_V3, "source.ttl")
+
+
+if __name__ == "__main__":
+    unittest.main()